@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import functools
+from typing import Any, Callable, Optional
+
+from anyio import CapacityLimiter, to_thread
+
+from store import Database
+
+
+class AsyncDatabase:
+    """
+    Database whose methods run on a pool of worker threads
+
+    The methods of the database become coroutines which don't block
+    the event loop. At most max_workers of them run at the same time,
+    each thread having its own SQLite connection.
+    """
+
+    def __init__(self, database: Database, max_workers: int):
+        self._database = database
+        self._max_workers = max_workers
+        # created lazily as it needs a running event loop
+        self._limiter: Optional[CapacityLimiter] = None
+
+    @property
+    def database(self) -> Database:
+        return self._database
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    async def run(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a function using the database on a worker thread
+        """
+        if self._limiter is None:
+            self._limiter = CapacityLimiter(self._max_workers)
+
+        call = functools.partial(function, *args, **kwargs)
+        return await to_thread.run_sync(call, limiter=self._limiter)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._database, name)
+
+        if not callable(attribute):
+            return attribute
+
+        async def method(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+
+        return method
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+import time
+import unittest
+
+from async_store import AsyncDatabase
+from store import Database, DbException
+
+
+class BlockingDatabase(Database):
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        # the calls only return once another one runs with them
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def wait(self, value: int) -> int:
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        try:
+            self.barrier.wait()
+            # the calls over the limit would start meanwhile
+            time.sleep(0.05)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+        return value
+
+    def fail(self):
+        raise DbException('failed')
+
+
+class AsyncDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.database = BlockingDatabase()
+        self.db = AsyncDatabase(self.database, 2)
+
+    def test_run_in_workers(self):
+        async def run():
+            return await asyncio.gather(*[self.db.wait(i) for i in range(4)])
+
+        self.assertEqual([0, 1, 2, 3], asyncio.run(run()))
+        self.assertEqual(2, self.database.max_running)
+
+    def test_exception(self):
+        with self.assertRaises(DbException):
+            asyncio.run(self.db.fail())
+
+    def test_attributes(self):
+        self.assertIs(self.database.catalog, self.db.catalog)
+        self.assertIsNone(self.db.journal)
+        self.assertIs(self.database, self.db.database)
+        self.assertEqual(2, self.db.max_workers)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
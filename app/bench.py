@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import List
+
+from learn import Language, Vocabulary, Word
+from store import load_database, SQLITE_PROFILES
+
+
+def create_database(path: str, profile: str, words: int, users: int):
+    database = load_database(path, profile=profile)
+
+    for language in Language:
+        database.create_language(language)
+
+    voc_words = [Word(word_output=f'de_{i}', word_input=f'fr_{i}', directive=None)
+                 for i in range(words)]
+    database.create_vocabulary(Vocabulary(voc_words[0], voc_words, 'fr', 'de'))
+
+    for i in range(users):
+        database.create_user(f'user{i}@example.com', 'password',
+                             {Language.FRENCH})
+
+    return database
+
+
+def answer_words(database, user, answers: int, errors: list, seed: int):
+    voc = database.get_vocabulary(user, 1)
+    # the same words are picked from one run to the other
+    session_id = database.create_new_session(user, voc, seed=seed).id
+
+    for i in range(answers):
+        try:
+            session = database.load_session(session_id, with_attempts=False)
+            word = session.current_word
+            if word is None:
+                return
+
+            # one wrong answer out of two
+            typed_word = word.word_output if i % 2 else 'wrong'
+            attempt = session.guess(word, typed_word)
+            database.add_word_attempt(session, attempt)
+        except Exception as e:
+            errors.append(e)
+
+
+def read_pages(database, user, reads: int, errors: list):
+    voc = database.get_vocabulary(user, 1)
+
+    for _ in range(reads):
+        try:
+            database.list_vocabularies(user)
+            database.vocabulary_progress(user)
+            database.vocabulary_stats(voc, user=user)
+        except Exception as e:
+            errors.append(e)
+
+
+def run_threads(targets) -> List[float]:
+    """
+    :param targets: function and arguments of each thread
+    :return: duration of each thread in seconds
+    """
+    durations = [0.0] * len(targets)
+
+    def run(i, target, args):
+        start = time.perf_counter()
+        target(*args)
+        durations[i] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=run, args=(i, target, args))
+               for i, (target, args) in enumerate(targets)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return durations
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES))
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--words', type=int, default=2000)
+    parser.add_argument('--answers', type=int, default=200)
+    parser.add_argument('--reads', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    print(f'{"profile":12} {"answers/s":>10} {"reads/s":>10}'
+          f' {"mixed answers/s":>16} {"mixed reads/s":>14} {"errors":>7}')
+
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.db')
+            database = create_database(path, profile, args.words, args.threads)
+            users = [database.get_user(f'user{i}@example.com', 'password')
+                     for i in range(args.threads)]
+            errors = []
+
+            durations = run_threads([(answer_words, (database, user, args.answers,
+                                                     errors, args.seed + i))
+                                     for i, user in enumerate(users)])
+            answers_per_second = len(users) * args.answers / max(durations)
+
+            durations = run_threads([(read_pages, (database, user, args.reads, errors))
+                                     for user in users])
+            reads_per_second = len(users) * args.reads / max(durations)
+
+            # half of the users answer while the other half reads
+            writers = users[:len(users) // 2]
+            readers = users[len(users) // 2:]
+            durations = run_threads([(answer_words, (database, user, args.answers,
+                                                     errors, args.seed + i))
+                                     for i, user in enumerate(writers)] +
+                                    [(read_pages, (database, user, args.reads, errors))
+                                     for user in readers])
+            mixed_answers_per_second = len(writers) * args.answers / max(durations[:len(writers)])
+            mixed_reads_per_second = len(readers) * args.reads / max(durations[len(writers):])
+
+            print(f'{profile:12} {answers_per_second:10.0f} {reads_per_second:10.0f}'
+                  f' {mixed_answers_per_second:16.0f} {mixed_reads_per_second:14.0f}'
+                  f' {len(errors):7}')
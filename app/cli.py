@@ -10,7 +10,7 @@ from termcolor import colored
 
 from learn import Word, InvalidFileException, Vocabulary, Session
 from learn import Language
-from store import load_database
+from store import load_database, migrate_database, schema_version, MIGRATIONS
 
 
 def say_goodbye():
@@ -124,12 +124,17 @@ if __name__ == '__main__':
     create_user_subparser.add_argument('username', help='new username', nargs=1)
     create_user_subparser.add_argument('--speaks', help='language spoken', nargs='+')
 
+    change_password_subparser = db_subparser.add_parser('change-password')
+    change_password_subparser.add_argument('username', help='username', nargs=1)
+
     db_subparser.add_parser('list-vocabularies')
     list_words_subparser = db_subparser.add_parser('list-words')
     list_words_subparser.add_argument('voc-id', help='vocabulary ID', nargs=1, type=int)
 
     remove_vocabulary_subparser = db_subparser.add_parser('remove-vocabulary')
     remove_vocabulary_subparser.add_argument('voc-id', help='vocabulary ID', nargs=1, type=int)
+    remove_vocabulary_subparser.add_argument('--dry-run', action='store_true',
+                                             help='only count the rows to remove')
 
     remove_word_subparser = db_subparser.add_parser('update-word')
     remove_word_subparser.add_argument('voc-id', nargs=1, type=int)
@@ -144,6 +149,8 @@ if __name__ == '__main__':
     add_word_subparser.add_argument('word-output', nargs=1)
 
     db_subparser.add_parser('init')
+    db_subparser.add_parser('migrate')
+    db_subparser.add_parser('summarize-sessions')
 
     args = parser.parse_args()
 
@@ -168,9 +175,12 @@ if __name__ == '__main__':
         database = args.database[0]
         database = load_database(database)
 
+        vocabularies = []
         for filename in files:
-            vocabulary = Vocabulary.load(filename)
-            database.create_vocabulary(vocabulary)
+            with open(filename) as f:
+                vocabularies.append(Vocabulary.load(f))
+
+        database.create_vocabularies(vocabularies)
 
     elif args.db_cmd == 'create-user':
         username = args.username[0]
@@ -191,12 +201,39 @@ if __name__ == '__main__':
 
         database.create_user(username, password, languages)
 
+    elif args.db_cmd == 'change-password':
+        username = args.username[0]
+
+        database = args.database[0]
+        database = load_database(database)
+
+        password = getpass.getpass()
+
+        database.change_password(username, password)
+
     elif args.db_cmd == 'init':
         database = args.database[0]
         database = load_database(database)
 
         for language in Language:
             database.create_language(language)
+    elif args.db_cmd == 'migrate':
+        database = args.database[0]
+        database = load_database(database, auto_migrate=False)
+
+        print(f'schema version {schema_version()}')
+
+        for version in migrate_database():
+            description = MIGRATIONS[version - 1].__doc__.strip().splitlines()[0]
+            print(f'applied migration {version}: {description}')
+
+        print(f'schema version {schema_version()}')
+    elif args.db_cmd == 'summarize-sessions':
+        database = args.database[0]
+        database = load_database(database)
+
+        count = database.summarize_sessions()
+        print(f'{count} finished sessions summarized')
     elif args.db_cmd == 'list-vocabularies':
         database = args.database[0]
         database = load_database(database)
@@ -232,7 +269,10 @@ if __name__ == '__main__':
             print("no vocabulary found", file=sys.stderr)
             sys.exit(1)
 
-        database.remove_vocabulary(voc)
+        removed = database.remove_vocabulary(voc, dry_run=args['dry_run'])
+
+        for table_name, count in removed.items():
+            print(f'{table_name:20} {count:8}')
 
     elif args.db_cmd == 'add-word':
         database = args.database[0]
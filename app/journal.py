@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class Journal:
+    """
+    Append-only file of records which weren't written to the database yet
+
+    Each record is a JSON line with a sequence number. A record is durable
+    once append returns: the threads appending at the same time share one
+    fsync (group commit). The records stay pending until a checkpoint
+    tells that they were written elsewhere, the file is then compacted to
+    the pending records.
+    """
+
+    def __init__(self, path: str, first_seq: int = 1):
+        """
+        :param first_seq: sequence number of the first new record, it must
+                          be greater than the last checkpoint
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+
+        self._pending: List[Tuple[int, bytes]] = []
+        self._records: List[Dict[str, Any]] = []
+
+        if os.path.exists(path):
+            self._read()
+
+        self._next_seq = first_seq
+        if self._records:
+            self._next_seq = max(first_seq, self._records[-1]['seq'] + 1)
+
+        self._written_seq = self._next_seq - 1
+        self._synced_seq = self._written_seq
+        self._syncing = False
+
+        self._file = open(path, 'ab')
+
+    def _read(self):
+        end = 0
+        with open(self._path, 'r+b') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # torn write of the last record before a crash
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+
+                self._records.append(record)
+                self._pending.append((record['seq'], line))
+                end += len(line)
+
+            # the new records are appended after the last complete one
+            if f.seek(0, os.SEEK_END) > end:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def recovered(self) -> List[Dict[str, Any]]:
+        """
+        :return: the records found when the journal was opened which
+                 weren't checkpointed yet
+        """
+        with self._lock:
+            return list(self._records)
+
+    def append(self,
+               record: Dict[str, Any],
+               numbered: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Write a record and wait until it is on disk
+
+        :param numbered: called with the record once it is written, before
+                         it is synced, in the order of the sequence numbers
+        :return: the record with its sequence number
+        """
+        with self._lock:
+            record = dict(record, seq=self._next_seq)
+            self._next_seq += 1
+
+            line = json.dumps(record).encode('utf-8') + b'\n'
+            self._file.write(line)
+            self._file.flush()
+
+            self._pending.append((record['seq'], line))
+            self._written_seq = record['seq']
+
+            if numbered is not None:
+                numbered(record)
+
+            self._sync(record['seq'])
+
+        return record
+
+    def _sync(self, seq: int):
+        # the lock is held, it is released during the fsync for the other
+        # threads to write their records which the next fsync syncs
+        while self._synced_seq < seq:
+            if self._syncing:
+                self._synced.wait()
+                continue
+
+            self._syncing = True
+            written_seq = self._written_seq
+            fileno = self._file.fileno()
+
+            self._lock.release()
+            try:
+                os.fsync(fileno)
+            finally:
+                self._lock.acquire()
+                self._syncing = False
+                self._synced.notify_all()
+
+            self._synced_seq = max(self._synced_seq, written_seq)
+
+    def checkpoint(self, seq: int):
+        """
+        Forget the records up to seq included, they were written elsewhere
+        """
+        with self._lock:
+            while self._syncing:
+                self._synced.wait()
+
+            self._pending = [(s, line) for s, line in self._pending if s > seq]
+            self._records = [r for r in self._records if r['seq'] > seq]
+
+            self._file.close()
+
+            if not self._pending:
+                # the records up to seq are skipped if the truncation
+                # is lost in a crash
+                self._file = open(self._path, 'wb')
+            else:
+                tmp_path = self._path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    for _, line in self._pending:
+                        f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self._path)
+
+                self._file = open(self._path, 'ab')
+
+            self._synced_seq = self._written_seq
+
+    def close(self):
+        with self._lock:
+            while self._syncing:
+                self._synced.wait()
+            self._file.close()
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 
+from abc import ABC, abstractmethod
 from enum import Enum
 from typing import TextIO
 import re
-from typing import List, Dict, Tuple, Set, Generator, Optional
-from collections import defaultdict
-from dataclasses import dataclass
+from typing import List, Dict, Tuple, Set, Generator, Iterable, Optional, Callable
+from collections import defaultdict, deque
+from dataclasses import dataclass, FrozenInstanceError
 from datetime import datetime
+import itertools
 import random
 
+from normalize import Normalizer, normalizer_for, edit_distance
+
 
 class InvalidFileException(Exception):
     pass
@@ -56,32 +60,89 @@ class User:
 
 
 
-def word_filter(word):
-    REMOVE_PARENTHESIS = re.compile('\s*\([^)]*\)\s*')
+REMOVE_PARENTHESIS = re.compile(r'\s*\([^)]*\)\s*')
+REMOVE_CHARACTERS = str.maketrans('', '', '|*')
 
-    word = word.lower()
-    word = word.replace('|', '').replace('*', '')
 
-    while REMOVE_PARENTHESIS.sub(' ', word) != word:
-        word = REMOVE_PARENTHESIS.sub(' ', word)
+def word_filter(word):
+    word = word.lower().translate(REMOVE_CHARACTERS)
+
+    # an opening parenthesis left has no closing one after it, the
+    # substitution doesn't need to be repeated
+    word = REMOVE_PARENTHESIS.sub(' ', word)
 
     return word.strip()
 
 
-@dataclass(frozen=True)
 class Word:
+    """
+    Immutable word, compared and hashed by its output, input and directive
+
+    The key and the answer accepted (see word_filter) are computed once,
+    they are swapped in the flipped word.
+    """
+    __slots__ = ('word_output', 'word_input', 'directive',
+                 '_key', '_answer', '_hash')
+
     word_output: str
     word_input: str
     directive: Optional[str]
 
+    def __init__(self,
+                 word_output: str,
+                 word_input: str,
+                 directive: Optional[str]):
+        set_attribute = object.__setattr__
+        set_attribute(self, 'word_output', word_output)
+        set_attribute(self, 'word_input', word_input)
+        set_attribute(self, 'directive', directive)
+
+        set_attribute(self, '_key', word_filter(word_input))
+        set_attribute(self, '_answer', word_filter(word_output))
+        set_attribute(self, '_hash', hash((word_output, word_input, directive)))
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f'cannot assign to field {name!r}')
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f'cannot delete field {name!r}')
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+
+        return ((self.word_output, self.word_input, self.directive) ==
+                (other.word_output, other.word_input, other.directive))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return (f'Word(word_output={self.word_output!r}, '
+                f'word_input={self.word_input!r}, '
+                f'directive={self.directive!r})')
+
+    def __reduce__(self):
+        return Word, (self.word_output, self.word_input, self.directive)
+
     def flip(self) -> 'Word':
-        return Word(word_output=self.word_input,
-                    word_input=self.word_output,
-                    directive=self.directive)
+        flipped = Word.__new__(Word)
+
+        set_attribute = object.__setattr__
+        set_attribute(flipped, 'word_output', self.word_input)
+        set_attribute(flipped, 'word_input', self.word_output)
+        set_attribute(flipped, 'directive', self.directive)
+
+        set_attribute(flipped, '_key', self._answer)
+        set_attribute(flipped, '_answer', self._key)
+        set_attribute(flipped, '_hash', hash((self.word_input, self.word_output,
+                                              self.directive)))
+
+        return flipped
 
     @property
     def is_complex(self) -> bool:
-        return self.word_output != self._simplified_word_output
+        return self.word_output != self._answer
 
     @property
     def is_name(self) -> Optional[str]:
@@ -95,14 +156,17 @@ class Word:
         A word is considered as "right" if it matches any
          word with the same key in a vocabulary.
         """
-        return word_filter(self.word_input)
+        return self._key
 
     @property
-    def _simplified_word_output(self) -> str:
-        return word_filter(self.word_output)
+    def answer(self) -> str:
+        """
+        :return: the answer accepted for the word, lowered
+        """
+        return self._answer
 
     def accepts(self, word_output: str) -> bool:
-        return self._simplified_word_output == word_output.lower()
+        return self._answer == word_output.lower()
 
     @property
     def line(self) -> str:
@@ -135,9 +199,54 @@ class WordAttempt:
     word: Word
     typed_word: str
     time: datetime
+    word_id: Optional[int] = None
+    # closest answer accepted when the answer typed is a near miss
+    near_answer: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class TypoTolerance:
+    """
+    Answers close to an accepted one (near misses)
+    """
+    # edit distance to the accepted answer
+    max_distance: int = 1
+    # the accepted answers shorter than this don't have near misses
+    min_length: int = 4
+    # whether a near miss is right
+    success: bool = False
+
+
+@dataclass(frozen=True)
+class SessionState:
+    """
+    Everything a session derives from its attempts
+
+    It allows to restore a session without replaying its attempts.
+    """
+    # in the order they were found, the words left are the other ones
+    found_words: List[Word]
+    error_count_by_word: Dict[Word, int]
+    last_words: List[Word]
+    current_word: Optional[Word]
+    # number of words picked, the picks are drawn from the seed of the
+    # session and this number
+    pick_count: int = 0
+
+
+def _common_language(language: Optional[str],
+                     other_language: Optional[str]) -> Optional[str]:
+    return language if language == other_language else None
 
 
 class Vocabulary:
+    """
+    Words to learn, with the index of their similar words and answers
+
+    The flipped vocabulary is a view sharing the words and their IDs with
+    this one. Its words are flipped when they are read, its index refers to
+    the words of this one and is built when first needed.
+    """
 
     def __init__(self,
                  name: Optional[Word] = None,
@@ -149,44 +258,158 @@ class Vocabulary:
         self._words = []
 
         self._similar_words = defaultdict(set)
+        # normalized answers accepted by key of the words
+        self._answers = defaultdict(set)
         self._id = None
+        # IDs of the words and words by ID
         self._word_ids = {}
+        self._words_by_id = {}
         self._flipped = flipped
         self._input_language = input_language
         self._output_language = output_language
+        self._normalizer = normalizer_for(output_language)
+        # whether the languages were given, the ones of the vocabularies
+        # added are merged with them
+        self._has_languages = input_language is not None or output_language is not None
+
+        # vocabulary of a view, the words are flipped on the fly
+        self._source = None
+        # flipped view of this vocabulary, once built
+        self._view = None
 
         for word in words or []:
             self.add_word(word)
 
+    @staticmethod
+    def _flipped_view(source: 'Vocabulary') -> 'Vocabulary':
+        voc = Vocabulary(None if source.name is None else source.name.flip(), [],
+                         source.output_language,
+                         source.input_language,
+                         not source.is_flipped)
+        voc._source = source
+        voc._words = None
+        voc._word_ids = None
+        voc._words_by_id = None
+        # the reverse key index is built when first needed
+        voc._similar_words = None
+        voc._answers = None
+        return voc
+
+    def _index(self) -> Tuple[Dict[str, Set[Word]], Dict[str, Set[str]]]:
+        """
+        :return: the similar words and the normalized answers by key, the
+                 similar words of a view aren't flipped
+        """
+        similar_words = self._similar_words
+
+        if similar_words is None:
+            similar_words = defaultdict(set)
+            answers = defaultdict(set)
+
+            # the key of a flipped word is the answer of the word
+            for word in self._source:
+                similar_words[word.answer].add(word)
+                answers[word.answer].add(self._normalizer(word.key))
+
+            # it is read from other threads without a lock
+            self._answers = answers
+            self._similar_words = similar_words
+
+        return similar_words, self._answers
+
+    def _words_changed(self):
+        if self._view is not None:
+            self._view._similar_words = None
+
     def add_word(self, word: Word, word_id: Optional[int] = None):
+        if self._source is not None:
+            self._source.add_word(word.flip(), word_id)
+            return
+
         self._words.append(word)
         if word_id is not None:
-            self._word_ids[word] = word_id
+            self._set_word_id(word, word_id)
         self._similar_words[word.key].add(word)
+        self._answers[word.key].add(self._normalizer(word.answer))
+        self._words_changed()
 
     @property
     def is_flipped(self) -> bool:
         return self._flipped
 
     def similar_words(self, word: Word) -> Set[Word]:
-        return self._similar_words[word.key]
+        similar_words, _ = self._index()
+
+        if self._source is not None:
+            return {similar_word.flip()
+                    for similar_word in similar_words.get(word.key, ())}
+        return similar_words.get(word.key, set())
+
+    @property
+    def normalizer(self) -> Normalizer:
+        """
+        :return: the normalizer of the answers, of the output language
+        """
+        return self._normalizer
+
+    def accepts(self, word: Word, word_output: str) -> bool:
+        """
+        :return: whether an answer is accepted for a word, it is accepted
+                 for the similar words as well
+        """
+        _, answers = self._index()
+        return self._normalizer(word_output) in answers.get(word.key, ())
+
+    def accepted_answers(self, word: Word) -> Set[str]:
+        """
+        :return: the normalized answers accepted for a word
+        """
+        _, answers = self._index()
+        return set(answers.get(word.key, ()))
+
+    def near_answer(self,
+                    word: Word,
+                    word_output: str,
+                    tolerance: TypoTolerance) -> Optional[str]:
+        """
+        :return: the closest normalized answer accepted for a word, if the
+                 answer is within the tolerance
+        """
+        _, answers = self._index()
+        word_output = self._normalizer(word_output)
+
+        ret = None
+        ret_distance = tolerance.max_distance + 1
+
+        # only the answers of the words with the same key are compared
+        for answer in sorted(answers.get(word.key, ())):
+            if len(answer) < tolerance.min_length:
+                continue
+
+            distance = edit_distance(word_output, answer, ret_distance - 1)
+            if distance is not None:
+                ret = answer
+                ret_distance = distance
+
+        return ret
 
     def flip(self) -> 'Vocabulary':
-        name = None if self._name is None else self._name.flip()
-        words = []
+        """
+        :return: the view of this vocabulary in the other direction, the
+                 same one every time
+        """
+        if self._source is not None:
+            return self._source
 
-        for word in self._words:
-            words.append(word.flip())
+        if self._view is None:
+            self._view = Vocabulary._flipped_view(self)
 
-        voc = Vocabulary(name, words,
-                         self.output_language,
-                         self.input_language,
-                         not self.is_flipped)
-        voc.set_id(self._id)
-        return voc
+        return self._view
 
     @property
     def id(self) -> Optional[int]:
+        if self._source is not None:
+            return self._source.id
         return self._id
 
     @property
@@ -198,26 +421,100 @@ class Vocabulary:
         return self._output_language
 
     def set_id(self, id: int):
-        self._id = id
+        if self._source is not None:
+            self._source.set_id(id)
+        else:
+            self._id = id
+
+    def _set_word_id(self, word: Word, word_id: int):
+        old_word_id = self._word_ids.get(word)
+        if old_word_id is not None and self._words_by_id.get(old_word_id) == word:
+            del self._words_by_id[old_word_id]
 
-    def set_word_id(self, word: Word, word_id: int):
         self._word_ids[word] = word_id
+        self._words_by_id[word_id] = word
+
+    def set_word_id(self, word: Word, word_id: int):
+        if self._source is not None:
+            self._source.set_word_id(word.flip(), word_id)
+        else:
+            self._set_word_id(word, word_id)
+
+    def set_word_ids(self, word_ids: Dict[Word, int]):
+        """
+        Set the IDs of words which don't have one yet, at once
+        """
+        if self._source is not None:
+            self._source.set_word_ids({word.flip(): word_id
+                                       for word, word_id in word_ids.items()})
+        else:
+            self._word_ids.update(word_ids)
+            self._words_by_id.update((word_id, word)
+                                     for word, word_id in word_ids.items())
 
     def word_id(self, word: Word) -> Optional[int]:
+        if self._source is not None:
+            return self._source.word_id(word.flip())
         return self._word_ids.get(word)
 
     def word(self, word_id: int) -> Optional[Word]:
-        for this_word, this_word_id in self._word_ids.items():
-            if word_id == this_word_id:
-                return this_word
-        return None
+        if self._source is not None:
+            word = self._source.word(word_id)
+            return None if word is None else word.flip()
+
+        return self._words_by_id.get(word_id)
 
     def add(self, other: 'Vocabulary'):
-        self._words.extend(other._words)
-        self._word_ids.update(other._word_ids)
+        """
+        Add the words of a vocabulary, a vocabulary without languages
+        takes the ones of the first vocabulary added with languages. A
+        language which differs between them is dropped, the answers are
+        then normalized by the default normalizer.
+        """
+        if self._source is not None:
+            self._source.add(other.flip())
+            return
+
+        languages = (other.input_language, other.output_language)
+
+        if languages != (None, None):
+            if self._has_languages:
+                languages = (_common_language(self._input_language, other.input_language),
+                             _common_language(self._output_language, other.output_language))
+            self._has_languages = True
+
+            if languages != (self._input_language, self._output_language):
+                self._set_languages(*languages)
+
+        for word in other:
+            self._words.append(word)
+
+            word_id = other.word_id(word)
+            if word_id is not None:
+                self._set_word_id(word, word_id)
+
+            self._similar_words[word.key].add(word)
+            self._answers[word.key].add(self._normalizer(word.answer))
+
+        self._words_changed()
 
-        for key, words in other._similar_words.items():
-            self._similar_words[key].update(words)
+    def _set_languages(self,
+                       input_language: Optional[str],
+                       output_language: Optional[str]):
+        self._input_language = input_language
+        self._output_language = output_language
+        self._normalizer = normalizer_for(output_language)
+
+        self._answers = defaultdict(set)
+        for word in self._words:
+            self._answers[word.key].add(self._normalizer(word.answer))
+
+        # the view already handed out follows the languages
+        if self._view is not None:
+            self._view._input_language = output_language
+            self._view._output_language = input_language
+            self._view._normalizer = normalizer_for(input_language)
+        self._words_changed()
 
     def __str__(self) -> str:
         if self.name is None:
@@ -230,15 +527,21 @@ class Vocabulary:
         return self._name
 
     def __iter__(self) -> Generator[Word, None, None]:
-        for word in self._words:
-            yield word
+        if self._source is not None:
+            for word in self._source:
+                yield word.flip()
+        else:
+            for word in self._words:
+                yield word
 
     def __len__(self) -> int:
+        if self._source is not None:
+            return len(self._source)
         return len(self._words)
 
     @property
     def words(self) -> List[Word]:
-        return self._words.copy()
+        return list(self)
 
     @staticmethod
     def _directive(line: str) -> Optional[str]:
@@ -294,12 +597,290 @@ class VocabularyStats:
 
     def __init__(self,
                  v: Vocabulary,
-                 errors_prob_by_word: Dict[Word, int]):
+                 errors_prob_by_word_id: Dict[int, float]):
+        """
+        :param errors_prob_by_word_id: percentage of errors (0 to 100)
+        """
         self._v = v
-        self._errors_prob_by_word = errors_prob_by_word
+        self._errors_prob_by_word_id = errors_prob_by_word_id
+
+    def errors_prob_for(self, w: Word) -> float:
+        return self.errors_prob_for_id(self._v.word_id(w))
+
+    def errors_prob_for_id(self, word_id: int) -> float:
+        return self._errors_prob_by_word_id.get(word_id, 0.0)
+
+
+class IndexedWords:
+    """
+    Distinct words which are removed and drawn at random in constant time
 
-    def errors_prob_for(self, w: Word):
-        return self._errors_prob_by_word.get(w, 0.0)
+    A word is removed by moving the last word to its position. An overlay
+    (see overlay) removes words without changing the words it is based on.
+    """
+
+    def __init__(self,
+                 words: Iterable[Word] = (),
+                 base: Optional['IndexedWords'] = None):
+        self._base = base
+
+        if base is None:
+            self._words = list(dict.fromkeys(words))
+            self._positions = {word: i for i, word in enumerate(self._words)}
+            self._length = len(self._words)
+        else:
+            # the positions and words changed since the base, a removed
+            # word has no position
+            self._words = {}
+            self._positions = {}
+            self._length = len(base)
+
+    def overlay(self) -> 'IndexedWords':
+        return IndexedWords(base=self)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Generator[Word, None, None]:
+        for i in range(self._length):
+            yield self._word_at(i)
+
+    def __contains__(self, word: Word) -> bool:
+        return self._position(word) is not None
+
+    def _word_at(self, position: int) -> Word:
+        if self._base is None or position in self._words:
+            return self._words[position]
+        return self._base._word_at(position)
+
+    def _position(self, word: Word) -> Optional[int]:
+        if self._base is None or word in self._positions:
+            return self._positions.get(word)
+        return self._base._position(word)
+
+    def remove(self, word: Word):
+        position = self._position(word)
+        if position is None:
+            raise ValueError(f'{word} not found')
+
+        last_position = self._length - 1
+        last_word = self._word_at(last_position)
+
+        if self._base is None:
+            del self._positions[word]
+            self._words.pop()
+            if position != last_position:
+                self._words[position] = last_word
+                self._positions[last_word] = position
+        else:
+            self._positions[word] = None
+            if position != last_position:
+                self._words[position] = last_word
+                self._positions[last_word] = position
+
+        self._length -= 1
+
+    def choose(self, rng: random.Random, excluded: Set[Word]) -> Word:
+        """
+        :param excluded: words not drawn, at least one word must be left
+        """
+        positions = sorted(self._position(word) for word in excluded)
+
+        # the position among the words which aren't excluded
+        position = rng.randrange(self._length - len(positions))
+        for excluded_position in positions:
+            if excluded_position > position:
+                break
+            position += 1
+
+        return self._word_at(position)
+
+
+class WeightedWords:
+    """
+    Distinct words drawn at random in proportion to their weights, in
+    logarithmic time (same interface as IndexedWords)
+
+    The cumulated weights are kept in a Fenwick tree. A word keeps its
+    position once removed, with a weight of 0.
+    """
+
+    def __init__(self,
+                 words: Iterable[Word] = (),
+                 weight: Optional[Callable[[Word], float]] = None,
+                 base: Optional['WeightedWords'] = None):
+        """
+        :param weight: weight of a word, strictly positive
+        """
+        self._base = base
+        # removed from the base
+        self._removed = set()
+
+        if base is None:
+            self._words = list(dict.fromkeys(words))
+            self._positions = {word: i for i, word in enumerate(self._words)}
+            self._weights = [weight(word) for word in self._words]
+            self._length = len(self._words)
+
+            # tree[i] is the sum of the weights of the positions
+            # (i - lowbit(i), i]
+            self._tree = [0.0] + self._weights
+            for i in range(1, len(self._tree)):
+                parent = i + (i & -i)
+                if parent < len(self._tree):
+                    self._tree[parent] += self._tree[i]
+        else:
+            self._length = len(base)
+
+    def overlay(self) -> 'WeightedWords':
+        return WeightedWords(base=self)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Generator[Word, None, None]:
+        if self._base is None:
+            return (word for word in self._words if word in self._positions)
+        return (word for word in self._base if word not in self._removed)
+
+    def __contains__(self, word: Word) -> bool:
+        if self._base is None:
+            return word in self._positions
+        return word not in self._removed and word in self._base
+
+    def _add(self, position: int, delta: float):
+        i = position + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, position: int) -> float:
+        """
+        :return: the sum of the weights before a position
+        """
+        ret = 0.0
+        i = position
+        while i > 0:
+            ret += self._tree[i]
+            i -= i & -i
+        return ret
+
+    def _find(self, mass: float) -> int:
+        """
+        :return: the position whose weight covers a mass
+        """
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+
+        while step:
+            i = position + step
+            if i < len(self._tree) and self._tree[i] <= mass:
+                position = i
+                mass -= self._tree[i]
+            step >>= 1
+
+        return position
+
+    def set_weight(self, word: Word, weight: float):
+        if self._base is not None:
+            raise ValueError('the weights of an overlay are the ones of its base')
+
+        position = self._positions[word]
+        self._add(position, weight - self._weights[position])
+        self._weights[position] = weight
+
+    def remove(self, word: Word):
+        if word not in self:
+            raise ValueError(f'{word} not found')
+
+        if self._base is None:
+            position = self._positions.pop(word)
+            self._add(position, -self._weights[position])
+            self._weights[position] = 0.0
+        else:
+            self._removed.add(word)
+
+        self._length -= 1
+
+    def choose(self, rng: random.Random, excluded: Set[Word]) -> Word:
+        """
+        :param excluded: words not drawn, at least one word must be left
+        """
+        if self._base is not None:
+            return self._base.choose(rng, excluded | self._removed)
+
+        positions = sorted(self._positions[word] for word in excluded)
+
+        total = self._prefix(len(self._weights))
+        total -= sum(self._weights[position] for position in positions)
+
+        # the mass among the words which aren't excluded
+        mass = rng.random() * total
+        for excluded_position in positions:
+            if self._prefix(excluded_position) > mass:
+                break
+            mass += self._weights[excluded_position]
+
+        position = min(self._find(mass), len(self._weights) - 1)
+
+        # rounding errors may end on a word which can't be drawn
+        candidates = itertools.chain(range(position, len(self._weights)),
+                                     range(position - 1, -1, -1))
+        for candidate in candidates:
+            word = self._words[candidate]
+            if self._weights[candidate] > 0 and word not in excluded:
+                return word
+
+
+class WordSelection(ABC):
+    """
+    How the next word of a session is picked among the words left to find
+    """
+
+    @abstractmethod
+    def words(self, words: Iterable[Word]) -> IndexedWords:
+        """
+        :return: the words left to find, drawn by the session
+        """
+
+    def update(self, words: IndexedWords, word: Word, error_count: int):
+        """
+        Called when a word left to find has error_count errors
+        """
+        pass
+
+
+class UniformSelection(WordSelection):
+    """
+    All the words left have the same probability to be picked
+    """
+
+    def words(self, words: Iterable[Word]) -> IndexedWords:
+        return IndexedWords(words)
+
+
+class WeightedSelection(WordSelection):
+    """
+    The words are picked in proportion to their weight, which grows with
+    their error probability and the errors of the session
+
+    The weights depend on the stats when the session is loaded, the
+    database only loads sessions with the uniform selection.
+    """
+
+    def __init__(self, stats: VocabularyStats, factor: float = 4.0):
+        self._stats = stats
+        self._factor = factor
+
+    def weight(self, word: Word, error_count: int = 0) -> float:
+        errors_prob = self._stats.errors_prob_for(word) / 100.0
+        return 1.0 + self._factor * (errors_prob + error_count)
+
+    def words(self, words: Iterable[Word]) -> WeightedWords:
+        return WeightedWords(words, self.weight)
+
+    def update(self, words: WeightedWords, word: Word, error_count: int):
+        words.set_weight(word, self.weight(word, error_count))
 
 
 class Session:
@@ -308,21 +889,73 @@ class Session:
     def __init__(self,
                  attempts: List[WordAttempt],
                  vocabulary: Vocabulary,
-                 current_word: Word = None):
+                 current_word: Word = None,
+                 state: Optional[SessionState] = None,
+                 seed: Optional[int] = None,
+                 selection: Optional[WordSelection] = None):
+        """
+        :param attempts: attempts of the session, replayed unless
+                         a state is given
+        :param state: state of the session, when given the attempts
+                      are only kept to be displayed
+        :param seed: seed of the words picked, a random one by default
+        :param selection: how the words are picked, UniformSelection
+                          by default
+        """
         self._attempts = attempts
         self._vocabulary = vocabulary
 
-        self._error_count_by_word = defaultdict(int)
+        if seed is None:
+            seed = random.getrandbits(32)
+        self._seed = seed
 
-        self._nok_words = vocabulary.words
-        for attempt in attempts:
-            word = attempt.word
+        if selection is None:
+            selection = UniformSelection()
+        self._selection = selection
 
-            if attempt.success:
-                if word in self._nok_words:
-                    self._nok_words.remove(word)
-            else:
-                self._error_count_by_word[word] += 1
+        self._error_count_by_word = defaultdict(int)
+        self._found_words = []
+
+        self._last_words = deque(maxlen=self._last_words_count)
+
+        # the words found are removed in the same order as when they were
+        # found, for the words left to be drawn the same way
+        self._nok_words = selection.words(vocabulary)
+
+        if state is not None:
+            for word in state.found_words:
+                self._nok_words.remove(word)
+            self._found_words.extend(state.found_words)
+            self._error_count_by_word.update(state.error_count_by_word)
+            self._last_words.extend(state.last_words)
+            self._pick_count = state.pick_count
+            current_word = state.current_word
+        else:
+            for attempt in attempts:
+                word = attempt.word
+
+                if attempt.success:
+                    if word in self._nok_words:
+                        self._nok_words.remove(word)
+                        self._found_words.append(word)
+                else:
+                    self._error_count_by_word[word] += 1
+
+            self._last_words.extend(attempt.word
+                                    for attempt in attempts[-self._last_words_count:])
+
+            # a word was picked when the session was created then after
+            # every attempt
+            self._pick_count = len(attempts)
+            if current_word is not None:
+                self._pick_count += 1
+
+        # the words in error which weren't found yet
+        self._nok_error_count = 0
+        for word, count in self._error_count_by_word.items():
+            if word in self._nok_words:
+                self._nok_error_count += 1
+                selection.update(self._nok_words, word, count)
 
         self._current_word = current_word
         if self._current_word is None:
@@ -346,25 +979,81 @@ class Session:
     def attempts(self) -> List[WordAttempt]:
         return self._attempts
 
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def pick_count(self) -> int:
+        return self._pick_count
+
+    @property
+    def state(self) -> SessionState:
+        return SessionState(found_words=list(self._found_words),
+                            error_count_by_word=dict(self._error_count_by_word),
+                            last_words=list(self._last_words),
+                            current_word=self._current_word,
+                            pick_count=self._pick_count)
+
     def set_id(self, id: int):
         self._id = id
 
+    @property
+    def _last_words_count(self) -> int:
+        # the words of the last attempts which are not picked again
+        return self.SKIP_LAST_WORDS_COUNT - 1
+
+    def _choose_word(self,
+                     nok_words: IndexedWords,
+                     last_words: Iterable[Word],
+                     pick_count: int) -> Optional[Word]:
+        if not nok_words:
+            return None
+
+        # the last words aren't picked again unless no other word is left
+        excluded = set()
+
+        for word in reversed(last_words):
+
+            if len(nok_words) - len(excluded) == 1:
+                break
+
+            if word in nok_words:
+                excluded.add(word)
+
+        # the same pick of a session always draws the same word
+        rng = random.Random(f'{self._seed}-{pick_count}')
+        return nok_words.choose(rng, excluded)
+
     def _pick_next_word(self):
+        self._current_word = self._choose_word(self._nok_words,
+                                               self._last_words,
+                                               self._pick_count)
+        self._pick_count += 1
 
-        if self._nok_words:
-            possible_words = list(self._nok_words)
+    def upcoming_words(self, count: int) -> List[Word]:
+        """
+        :return: the words picked after the current one, if the current
+                 one and the next ones are found
+        """
+        nok_words = self._nok_words.overlay()
+        last_words = deque(self._last_words, maxlen=self._last_words_count)
+        pick_count = self._pick_count
+        word = self._current_word
 
-            for attempt in self._attempts[:-self.SKIP_LAST_WORDS_COUNT:-1]:
+        ret = []
 
-                if len(possible_words) == 1:
-                    break
+        while word is not None and len(ret) < count:
+            last_words.append(word)
+            nok_words.remove(word)
 
-                if attempt.word in possible_words:
-                    possible_words.remove(attempt.word)
+            word = self._choose_word(nok_words, last_words, pick_count)
+            pick_count += 1
 
-            self._current_word = random.choice(possible_words)
-        else:
-            self._current_word = None
+            if word is not None:
+                ret.append(word)
+
+        return ret
 
     @property
     def vocabulary_left(self) -> Vocabulary:
@@ -387,14 +1076,38 @@ class Session:
     def accuracy(self) -> float:
         word_in_error = len(self._error_count_by_word)
 
-        untested_words = set(self._nok_words) - set(self._error_count_by_word)
-        return 100.0 - word_in_error / (len(self._vocabulary) - len(untested_words)) * 100.0
+        untested_words = len(self._nok_words) - self._nok_error_count
+        return 100.0 - word_in_error / (len(self._vocabulary) - untested_words) * 100.0
 
     @property
     def current_word(self) -> Optional[Word]:
         return self._current_word
 
-    def guess(self, word: Word, word_output: str) -> Optional[WordAttempt]:
+    @property
+    def last_words(self) -> List[Word]:
+        return list(self._last_words)
+
+    @property
+    def remaining_words(self) -> List[Word]:
+        """
+        :return: the words left to find
+        """
+        return list(self._nok_words)
+
+    def accepted_answers(self, word: Word) -> Set[str]:
+        """
+        :return: the answers accepted for a word, once normalized by the
+                 normalizer of the vocabulary
+        """
+        return self.vocabulary.accepted_answers(word)
+
+    def guess(self,
+              word: Word,
+              word_output: str,
+              typo_tolerance: Optional[TypoTolerance] = None) -> Optional[WordAttempt]:
+        """
+        :param typo_tolerance: the near misses reported, none by default
+        """
 
         current_word = self.current_word
         if word != self._current_word:
@@ -403,26 +1116,38 @@ class Session:
             else:
                 return None
 
-        # find a word which matches
-        for word in self.vocabulary.similar_words(current_word):
-            if word.accepts(word_output):
-                success = True
-                break
-        else:
-            success = False
+        # the answer of a word with the same key is accepted as well
+        success = self.vocabulary.accepts(current_word, word_output)
+
+        near_answer = None
+        if not success and typo_tolerance is not None:
+            near_answer = self.vocabulary.near_answer(current_word, word_output,
+                                                      typo_tolerance)
+            success = near_answer is not None and typo_tolerance.success
 
         attempt = WordAttempt(word=current_word,
                               typed_word=word_output,
                               success=success,
-                              time=datetime.now())
+                              time=datetime.now(),
+                              word_id=self.vocabulary.word_id(current_word),
+                              near_answer=near_answer)
         self._attempts.append(attempt)
 
+        self._last_words.append(current_word)
+
         if success:
             self._nok_words.remove(current_word)
+            self._found_words.append(current_word)
+            if current_word in self._error_count_by_word:
+                self._nok_error_count -= 1
             self._current_word = None
             self._pick_next_word()
         else:
+            if current_word not in self._error_count_by_word:
+                self._nok_error_count += 1
             self._error_count_by_word[current_word] += 1
+            self._selection.update(self._nok_words, current_word,
+                                   self._error_count_by_word[current_word])
             self._pick_next_word()
 
         return attempt
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
 from io import StringIO
+import random
+from typing import List
 import unittest
 
-from learn import Word, Vocabulary, Session
+from learn import Word, Vocabulary, Session, IndexedWords, TypoTolerance
+from learn import VocabularyStats, WeightedSelection, WeightedWords
+from normalize import normalizer_for
 
 
 class LearnTest(unittest.TestCase):
@@ -19,6 +23,12 @@ class LearnTest(unittest.TestCase):
         words = [self.word1, self.word2]
         self.voc = Vocabulary(self.word1, words, 'fr', 'de')
 
+    def _numbered_words(self, count: int) -> List[Word]:
+        return [Word(word_output=f'output_{i}',
+                     word_input=f'input_{i}',
+                     directive=None)
+                for i in range(count)]
+
     def test_learn_vocabulary(self):
 
         words = Session([], self.voc, self.word1)
@@ -49,6 +59,58 @@ class LearnTest(unittest.TestCase):
 
         self.assertEqual(self.word1.flip(), new_voc.name)
 
+    def test_flipped_view(self):
+        self.voc.set_id(1)
+        self.voc.set_word_id(self.word1, 10)
+        new_voc = self.voc.flip()
+
+        self.assertIs(new_voc, self.voc.flip())
+        self.assertIs(self.voc, new_voc.flip())
+        self.assertEqual(self.word1, self.word1.flip().flip())
+        self.assertTrue(new_voc.is_flipped)
+        self.assertEqual(1, new_voc.id)
+        self.assertEqual([word.flip() for word in self.voc.words], new_voc.words)
+        self.assertEqual(10, new_voc.word_id(self.word1.flip()))
+        self.assertEqual(self.word1.flip(), new_voc.word(10))
+        self.assertIn(self.word1.flip(), new_voc.similar_words(self.word1.flip()))
+
+        # the words added on either side are seen on both
+        word = Word(word_output='new_output', word_input='new_input', directive=None)
+        self.voc.add_word(word, 11)
+        self.assertEqual({word.flip()}, new_voc.similar_words(word.flip()))
+        self.assertTrue(new_voc.accepts(word.flip(), 'new_input'))
+
+        other_word = Word(word_output='other_input', word_input='other_output',
+                          directive=None)
+        new_voc.add_word(other_word, 12)
+        self.assertEqual(other_word.flip(), self.voc.word(12))
+        self.assertTrue(self.voc.accepts(other_word.flip(), 'other_output'))
+        self.assertEqual(len(self.voc), len(new_voc))
+
+    def test_word_ids(self):
+        voc = Vocabulary(self.word1, [self.word1])
+        voc.set_word_ids({self.word1: 1})
+        voc.add_word(self.word2, 2)
+
+        word3 = Word(word_output='word3_output',
+                     word_input='word3_input',
+                     directive=None)
+        other_voc = Vocabulary(None, [])
+        other_voc.flip().add_word(word3.flip(), 3)
+        voc.add(other_voc)
+
+        self.assertEqual(self.word1, voc.word(1))
+        self.assertEqual(self.word2, voc.word(2))
+        self.assertEqual(word3, voc.word(3))
+
+        voc.set_word_id(self.word2, 4)
+        self.assertIsNone(voc.word(2))
+        self.assertEqual(self.word2, voc.word(4))
+        self.assertEqual(4, voc.word_id(self.word2))
+
+        self.assertEqual(self.word2.flip(), voc.flip().word(4))
+        self.assertIsNone(voc.flip().word(5))
+
     def test_guess_other_main_word(self):
         """
         A user can guess another word if necessary
@@ -110,6 +172,25 @@ class LearnTest(unittest.TestCase):
         self.assertTrue(complex_word.accepts('die Umweltverschmutzung'))
         self.assertEqual('abc (1)', word.word_output)
 
+        nested_word = Word(word_output='Die|* (a (b) c) Stadt (',
+                           word_input='def (2)',
+                           directive=None)
+        self.assertTrue(nested_word.accepts('die c) stadt ('))
+        self.assertEqual('def', nested_word.key)
+
+    def test_word_value(self):
+        word = Word(word_output='abc', word_input='def', directive=None)
+        same_word = Word(word_output='abc', word_input='def', directive=None)
+
+        self.assertEqual(word, same_word)
+        self.assertEqual(hash(word), hash(same_word))
+        self.assertEqual(hash(('abc', 'def', None)), hash(word))
+        self.assertNotEqual(word, Word(word_output='abc', word_input='def',
+                                       directive='#name'))
+
+        with self.assertRaises(AttributeError):
+            word.word_output = 'ghi'
+
     def test_load_vocabulary(self):
         expected_word = Word(word_output='abc',
                              word_input='def',
@@ -137,6 +218,194 @@ class LearnTest(unittest.TestCase):
         self.assertEqual('fr', voc.input_language)
         self.assertEqual('de', voc.output_language)
 
+    def test_accepted_answers(self):
+        word = Word(word_output='Word1 (the output)',
+                    word_input='word1_input',
+                    directive=None)
+        voc = Vocabulary(word, [word, self.word2], 'fr', 'de')
+
+        session = Session([], voc, word)
+        self.assertEqual({'word1'}, session.accepted_answers(word))
+
+        session.guess(word, 'WORD1')
+        self.assertEqual([word], session.last_words)
+
+    def test_seeded_session(self):
+        words = self._numbered_words(10)
+        voc = Vocabulary(words[0], words, 'fr', 'de')
+
+        def picked_words(session):
+            ret = [session.current_word]
+            while not session.is_finished:
+                word = session.current_word
+                # one wrong answer out of three
+                typed_word = 'wrong' if len(ret) % 3 == 0 else word.word_output
+                session.guess(word, typed_word)
+                ret.append(session.current_word)
+            return ret
+
+        # the same words are picked with the same seed
+        self.assertEqual(picked_words(Session([], voc, seed=42)),
+                         picked_words(Session([], voc, seed=42)))
+
+        # the upcoming words are picked when the words are found
+        session = Session([], voc, seed=42)
+        upcoming_words = session.upcoming_words(3)
+        self.assertEqual(3, len(upcoming_words))
+
+        for word in upcoming_words:
+            session.guess(session.current_word, session.current_word.word_output)
+            self.assertEqual(word, session.current_word)
+
+    def test_indexed_words(self):
+        words = self._numbered_words(5)
+
+        indexed_words = IndexedWords(words)
+        indexed_words.remove(words[1])
+        self.assertEqual(4, len(indexed_words))
+        self.assertNotIn(words[1], indexed_words)
+        self.assertEqual(set(words) - {words[1]}, set(indexed_words))
+
+        # the overlay doesn't change its base
+        overlay = indexed_words.overlay()
+        overlay.remove(words[4])
+        overlay.remove(words[0])
+        self.assertEqual({words[2], words[3]}, set(overlay))
+        self.assertEqual(4, len(indexed_words))
+
+        rng = random.Random(0)
+        for _ in range(20):
+            self.assertEqual(words[3], overlay.choose(rng, {words[2]}))
+            self.assertNotIn(indexed_words.choose(rng, {words[0], words[4]}),
+                             {words[0], words[1], words[4]})
+
+    def test_weighted_words(self):
+        words = self._numbered_words(4)
+        weights = {words[0]: 1.0, words[1]: 2.0, words[2]: 3.0, words[3]: 0.5}
+
+        weighted_words = WeightedWords(words, weights.get)
+        weighted_words.remove(words[0])
+        weighted_words.set_weight(words[3], 4.0)
+        self.assertEqual(3, len(weighted_words))
+        self.assertEqual(words[1:], list(weighted_words))
+
+        rng = random.Random(0)
+        drawn = [weighted_words.choose(rng, {words[1]}) for _ in range(1000)]
+        self.assertEqual({words[2], words[3]}, set(drawn))
+        self.assertGreater(drawn.count(words[3]), drawn.count(words[2]))
+
+        # the overlay doesn't change its base
+        overlay = weighted_words.overlay()
+        overlay.remove(words[3])
+        self.assertEqual(words[2], overlay.choose(rng, {words[1]}))
+        self.assertIn(words[3], weighted_words)
+
+    def test_weighted_session(self):
+        words = self._numbered_words(10)
+        voc = Vocabulary(words[0], words, 'fr', 'de')
+        for word_id, word in enumerate(words):
+            voc.set_word_id(word, word_id)
+
+        # the first word is almost always wrong
+        stats = VocabularyStats(voc, {0: 100.0})
+        selection = WeightedSelection(stats, factor=1000.0)
+
+        picked_words = []
+        for seed in range(10):
+            session = Session([], voc, seed=seed, selection=selection)
+            picked_words.append(session.current_word)
+
+            upcoming_words = session.upcoming_words(3)
+            for word in upcoming_words:
+                session.guess(session.current_word, session.current_word.word_output)
+                self.assertEqual(word, session.current_word)
+
+        self.assertGreater(picked_words.count(words[0]), 5)
+
+    def test_normalized_answers(self):
+        word = Word(word_output='das Mädchen (-)',
+                    word_input='la fille',
+                    directive=None)
+        voc = Vocabulary(word, [word], 'fr', 'de')
+
+        self.assertEqual({'das maedchen'}, voc.accepted_answers(word))
+        self.assertTrue(voc.accepts(word, 'das  maedchen'))
+        self.assertTrue(voc.accepts(word, 'Das Mädchen'))
+        self.assertFalse(voc.accepts(word, 'das madchen'))
+
+        # the answers are normalized in the output language
+        flipped_voc = voc.flip()
+        self.assertTrue(flipped_voc.accepts(word.flip(), 'La fille.'))
+
+        session = Session([], voc, word)
+        self.assertTrue(session.guess(word, 'das maedchen').success)
+
+    def test_merged_normalized_answers(self):
+        word = Word(word_output='das Mädchen (-)',
+                    word_input='la fille',
+                    directive=None)
+
+        # the merged vocabulary normalizes the answers in German
+        merged_voc = Vocabulary()
+        merged_voc.add(Vocabulary(word, [word], 'fr', 'de'))
+        self.assertEqual('de', merged_voc.output_language)
+        self.assertTrue(merged_voc.accepts(word, 'das maedchen'))
+
+        merged_voc.flip().add(Vocabulary(None, [self.word1.flip()], 'de', 'fr'))
+        self.assertTrue(merged_voc.accepts(self.word1, self.word1.word_output))
+
+        # the views already handed out are kept
+        flipped_voc = merged_voc.flip()
+        self.assertEqual(1, len(flipped_voc.similar_words(word.flip())))
+
+        # the answers of mixed output languages are normalized by default
+        merged_voc.add(Vocabulary(None, [self.word2], 'de', 'fr'))
+        self.assertIsNone(merged_voc.output_language)
+        self.assertIsNone(merged_voc.input_language)
+        self.assertIs(flipped_voc, merged_voc.flip())
+        self.assertIsNone(flipped_voc.output_language)
+        self.assertEqual(merged_voc.normalizer, normalizer_for(None))
+        self.assertEqual(flipped_voc.normalizer, normalizer_for(None))
+
+        self.assertTrue(merged_voc.accepts(word, 'Das Mädchen'))
+        self.assertFalse(merged_voc.accepts(word, 'das maedchen'))
+        self.assertTrue(merged_voc.accepts(self.word2, self.word2.word_output))
+        self.assertIn(self.word2.flip(), flipped_voc.words)
+        self.assertTrue(flipped_voc.accepts(self.word2.flip(), self.word2.word_input))
+
+    def test_near_answer(self):
+        word = Word(word_output='das Mädchen (-)',
+                    word_input='la fille',
+                    directive=None)
+        short_word = Word(word_output='ja',
+                          word_input='oui',
+                          directive=None)
+        voc = Vocabulary(word, [word, short_word], 'fr', 'de')
+
+        tolerance = TypoTolerance()
+        self.assertEqual('das maedchen', voc.near_answer(word, 'das medchen', tolerance))
+        self.assertIsNone(voc.near_answer(word, 'das mdchn', tolerance))
+        self.assertIsNone(voc.near_answer(short_word, 'je', tolerance))
+
+        session = Session([], voc, word)
+        attempt = session.guess(word, 'Das Madchen')
+        self.assertFalse(attempt.success)
+        self.assertIsNone(attempt.near_answer)
+
+        attempt = session.guess(word, 'Das Madchen', tolerance)
+        self.assertFalse(attempt.success)
+        self.assertEqual('das maedchen', attempt.near_answer)
+
+        attempt = session.guess(word, 'das madchen', TypoTolerance(success=True))
+        self.assertTrue(attempt.success)
+        self.assertEqual('das maedchen', attempt.near_answer)
+
+        # the exact answers aren't near misses
+        session = Session([], voc, word)
+        attempt = session.guess(word, 'das maedchen', tolerance)
+        self.assertTrue(attempt.success)
+        self.assertIsNone(attempt.near_answer)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)
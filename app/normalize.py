@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import unicodedata
+from typing import Any, Dict, Optional
+
+# removed from the answers of every language
+PUNCTUATION = '.,;:!?¡¿"'
+
+
+class Normalizer:
+    """
+    Normalization of the answers typed in a language
+
+    Two answers are the same when they are normalized the same way. The
+    characters replaced are compiled once into a translation table.
+    """
+
+    def __init__(self,
+                 transliterations: Optional[Dict[str, str]] = None,
+                 punctuation: str = PUNCTUATION,
+                 fold_accents: bool = False,
+                 fold_width: bool = False,
+                 remove_spaces: bool = False):
+        """
+        :param transliterations: replacement of characters, applied before
+                                 the accents are folded
+        :param punctuation: characters replaced by a space
+        :param fold_accents: whether the accents are removed (é => e)
+        :param fold_width: whether the full-width characters are replaced
+                           by their ASCII version (，=> ,)
+        :param remove_spaces: whether the spaces are removed, otherwise
+                              they are collapsed
+        """
+        self._transliterations = dict(transliterations or {})
+        self._punctuation = punctuation
+        self._fold_accents = fold_accents
+        self._fold_width = fold_width
+        self._remove_spaces = remove_spaces
+
+        table = {character: ' ' for character in punctuation}
+        table.update(self._transliterations)
+        self._table = str.maketrans(table)
+
+    def __call__(self, text: str) -> str:
+        text = text.lower()
+
+        # the same characters may be typed composed or not
+        text = unicodedata.normalize('NFKC' if self._fold_width else 'NFC', text)
+
+        text = text.translate(self._table)
+
+        if self._fold_accents:
+            text = ''.join(character
+                           for character in unicodedata.normalize('NFKD', text)
+                           if not unicodedata.combining(character))
+
+        if self._remove_spaces:
+            return ''.join(text.split())
+        return ' '.join(text.split())
+
+    @property
+    def rules(self) -> Dict[str, Any]:
+        """
+        :return: the rules of the normalizer, to apply them elsewhere
+        """
+        return {
+            'transliterations': self._transliterations,
+            'punctuation': self._punctuation,
+            'fold_accents': self._fold_accents,
+            'fold_width': self._fold_width,
+            'remove_spaces': self._remove_spaces,
+        }
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """
+    :return: the Levenshtein distance between two texts or None if it is
+             greater than max_distance
+
+    Only the diagonal band of width 2 * max_distance + 1 is computed.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+
+    too_far = max_distance + 1
+    # distances between the first i characters of a and those of b
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+
+        start = max(1, i - max_distance)
+        end = min(len(b), i + max_distance)
+
+        for j in range(start, end + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + cost,
+                             too_far)
+
+        if min(current[start - 1:end + 1]) > max_distance:
+            return None
+        previous = current
+
+    if previous[len(b)] > max_distance:
+        return None
+    return previous[len(b)]
+
+
+DEFAULT_NORMALIZER = Normalizer()
+
+# by language code
+NORMALIZERS = {
+    'fr': Normalizer(transliterations={'œ': 'oe', 'æ': 'ae', '’': "'"},
+                     fold_accents=True),
+    'en': Normalizer(transliterations={'’': "'"},
+                     fold_accents=True),
+    'de': Normalizer(transliterations={'ä': 'ae', 'ö': 'oe', 'ü': 'ue',
+                                       'ß': 'ss', '’': "'"},
+                     fold_accents=True),
+    'cn': Normalizer(punctuation=PUNCTUATION + '。、·',
+                     fold_width=True,
+                     remove_spaces=True),
+}
+
+
+def normalizer_for(language: Optional[str]) -> Normalizer:
+    """
+    :param language: code of the language, see Language
+    """
+    return NORMALIZERS.get(language, DEFAULT_NORMALIZER)
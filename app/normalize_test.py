@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from normalize import Normalizer, normalizer_for, edit_distance
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_default(self):
+        normalizer = normalizer_for(None)
+
+        self.assertEqual('guten tag', normalizer('  Guten   Tag! '))
+        self.assertEqual('café', normalizer('Café'))
+
+    def test_german(self):
+        normalizer = normalizer_for('de')
+
+        self.assertEqual('maedchen', normalizer('Mädchen'))
+        self.assertEqual('maedchen', normalizer('Mädchen'))
+        self.assertEqual('strasse', normalizer('Straße'))
+        self.assertNotEqual(normalizer('Mädchen'), normalizer('madchen'))
+
+    def test_french(self):
+        normalizer = normalizer_for('fr')
+
+        self.assertEqual('l\'ecole', normalizer('L’école'))
+        self.assertEqual('coeur', normalizer('cœur'))
+
+    def test_chinese(self):
+        normalizer = normalizer_for('cn')
+
+        self.assertEqual('你好', normalizer('你 好，'))
+        self.assertEqual('nihao', normalizer('ＮＩ　ＨＡＯ。'))
+
+    def test_rules(self):
+        normalizer = Normalizer(transliterations={'x': 'y'}, punctuation='')
+
+        self.assertEqual('y.', normalizer('X.'))
+        self.assertEqual({'x': 'y'}, normalizer.rules['transliterations'])
+
+    def test_edit_distance(self):
+        self.assertEqual(0, edit_distance('maison', 'maison', 1))
+        self.assertEqual(1, edit_distance('maison', 'maisn', 1))
+        self.assertEqual(1, edit_distance('maison', 'maizon', 1))
+        self.assertEqual(1, edit_distance('maison', 'mison', 2))
+        self.assertEqual(2, edit_distance('maison', 'masn', 2))
+        self.assertIsNone(edit_distance('maison', 'masn', 1))
+        self.assertIsNone(edit_distance('maison', 'mai', 2))
+        self.assertEqual(3, edit_distance('', 'abc', 3))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
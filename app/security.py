@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 #source: https://stackoverflow.com/questions/9594125/salt-and-hash-a-password-in-python
 
+from collections import OrderedDict
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional
+
 import bcrypt
 
 
@@ -12,3 +20,71 @@ def get_hashed_password(plain_text_password):
 def check_password(plain_text_password, hashed_password):
     # Check hashed password. Using bcrypt, the salt is saved into the hash itself
     return bcrypt.checkpw(plain_text_password, hashed_password)
+
+
+class CredentialCache:
+    """
+    Values of the credentials which were checked recently
+
+    A credential is kept at most ttl seconds and only the max_size most
+    recently used ones are kept. The password isn't stored, only a digest
+    keyed by a secret of the process.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._key = secrets.token_bytes(32)
+        self._lock = threading.Lock()
+        # email => (digest, expiration, value)
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, email: str, password: str) -> bytes:
+        message = f'{email}\0{password}'.encode('utf-8')
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def get(self, email: str, password: str) -> Optional[Any]:
+        digest = self._digest(email, password)
+
+        with self._lock:
+            entry = self._entries.get(email)
+
+            if entry is not None:
+                entry_digest, expiration, value = entry
+
+                if expiration <= time.monotonic():
+                    del self._entries[email]
+                elif hmac.compare_digest(entry_digest, digest):
+                    self._entries.move_to_end(email)
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, email: str, password: str, value: Any):
+        digest = self._digest(email, password)
+        expiration = time.monotonic() + self._ttl
+
+        with self._lock:
+            self._entries[email] = (digest, expiration, value)
+            self._entries.move_to_end(email)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'credentials': len(self._entries)
+            }
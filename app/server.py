@@ -1,21 +1,27 @@
 # -*- coding: utf-8 -*-
 
 import os
-from typing import Optional
+from typing import List, Optional, Tuple
 from pathlib import Path
 import secrets
 from collections import defaultdict
+import asyncio
+import logging
 
 from fastapi import FastAPI, Request, Response, Depends, HTTPException, status
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from starlette.responses import RedirectResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
-from learn import Vocabulary, Session, Word, Language, User
-from store import load_database, DbException
+from learn import Vocabulary, Session, Word, WordAttempt, Language, User, TypoTolerance
+from store import load_database, DbException, SQLITE_PRAGMAS
+from async_store import AsyncDatabase
+from session_cache import SessionCache
 
 
 
@@ -25,13 +31,89 @@ TEMPLATES = Jinja2Templates(directory=str(BASE_PATH / "templates"))
 DATADIR = Path(os.environ.get('DATADIR', BASE_PATH))
 
 VOCABULARIES = DATADIR / 'learn.db'
-db = load_database(VOCABULARIES)
+# number of threads querying the database at the same time
+DB_WORKERS = int(os.environ.get('DB_WORKERS', 8))
+
+# profile of the SQLite connections and pragmas overriding it
+# (e.g. SQLITE_BUSY_TIMEOUT=10000)
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default')
+SQLITE_PRAGMA_VALUES = {pragma: os.environ[f'SQLITE_{pragma.upper()}']
+                        for pragma in SQLITE_PRAGMAS
+                        if f'SQLITE_{pragma.upper()}' in os.environ}
+
+# write-behind: the answers are appended to a journal and written to
+# the database every DB_JOURNAL_FLUSH_INTERVAL seconds
+DB_JOURNAL = os.environ.get('DB_JOURNAL', '0') == '1'
+DB_JOURNAL_FLUSH_INTERVAL = float(os.environ.get('DB_JOURNAL_FLUSH_INTERVAL', 0.1))
+
+db = AsyncDatabase(load_database(VOCABULARIES,
+                                 profile=SQLITE_PROFILE,
+                                 pragmas=SQLITE_PRAGMA_VALUES,
+                                 journal=str(DATADIR / 'learn.journal') if DB_JOURNAL else None),
+                   DB_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+# sessions being learned, evicted after SESSION_CACHE_TTL seconds unused
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 1024))
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', 600))
+
+sessions = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+# number of words sent after the next one, for the browser to show them
+# without waiting for the server
+UPCOMING_WORD_COUNT = int(os.environ.get('UPCOMING_WORD_COUNT', 3))
+
+# the answers at most TYPO_DISTANCE edits away from an accepted one are near
+# misses, right ones if TYPO_SUCCESS is set
+TYPO_DISTANCE = int(os.environ.get('TYPO_DISTANCE', 0))
+TYPO_SUCCESS = os.environ.get('TYPO_SUCCESS', '0') == '1'
+
+typo_tolerance = None
+if TYPO_DISTANCE > 0:
+    typo_tolerance = TypoTolerance(max_distance=TYPO_DISTANCE, success=TYPO_SUCCESS)
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 security = HTTPBasic()
 
 
+async def flush_journal():
+    while True:
+        await asyncio.sleep(DB_JOURNAL_FLUSH_INTERVAL)
+
+        try:
+            await db.flush_journal()
+        except Exception:
+            # the records stay in the journal for the next flush
+            logger.exception('cannot flush the journal')
+
+
+@app.on_event("startup")
+async def start_journal():
+    if db.journal is not None:
+        app.state.journal_flusher = asyncio.create_task(flush_journal())
+
+
+@app.on_event("startup")
+async def watch_vocabularies():
+    loop = asyncio.get_running_loop()
+
+    # the vocabularies are changed from the worker threads
+    def vocabulary_changed(voc_id: Optional[int]):
+        loop.call_soon_threadsafe(sessions.invalidate_vocabulary, voc_id)
+
+    db.catalog.add_listener(vocabulary_changed)
+
+
+@app.on_event("shutdown")
+async def stop_journal():
+    if db.journal is not None:
+        app.state.journal_flusher.cancel()
+        await db.flush_journal()
+        db.journal.close()
+
+
 class WordInput(BaseModel):
     word_id: int
     word: str
@@ -51,16 +133,65 @@ class WordResult(BaseModel):
 
     hint: Optional[str]
 
+    # closest accepted answer, if the answer is a near miss
+    near_answer: Optional[str] = None
+
     # if None => no more word
     next_word: Optional[WordInput]
 
+    # the words after next_word if it is found, and the ones after
+    upcoming_words: List[WordInput] = []
 
-def get_user(creds: HTTPBasicCredentials = Depends(security)) -> User:
+
+class WordAnswer(BaseModel):
+    # increasing number given by the client, the answers whose number
+    # was already saved are duplicates
+    seq: int
+    word_id: int
+    word: str
+
+
+class WordsInput(BaseModel):
+    session_id: int
+    answers: List[WordAnswer]
+
+
+class AnswerResult(WordResult):
+    seq: int
+
+
+class WordsResult(BaseModel):
+    results: List[AnswerResult]
+
+    # seq of the answers which were already saved, they aren't applied again
+    duplicates: List[int]
+
+    # if None => no more word
+    next_word: Optional[WordInput]
+
+    upcoming_words: List[WordInput] = []
+
+
+async def load_session(session_id: int, with_attempts: bool = True) -> Session:
+    """
+    Load a session from the cache or the database, the lock of the
+    session must be held
+    """
+    session = sessions.get(session_id, with_attempts)
+
+    if session is None:
+        session = await db.load_session(session_id, with_attempts=with_attempts)
+        sessions.put(session, with_attempts)
+
+    return session
+
+
+async def get_user(creds: HTTPBasicCredentials = Depends(security)) -> User:
     username = creds.username
     password = creds.password
 
     try:
-        user = db.get_user(username, password)
+        user = await db.get_user(username, password)
     except DbException:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,18 +215,26 @@ def root():
     )
 
 
+@app.get("/stats")
+def stats():
+    return {
+        'sessions': sessions.stats,
+        'credentials': db.credentials.stats,
+    }
+
+
 @app.get("/vocabulary")
 async def index(request: Request,
                 id: int,
                 user: User = Depends(get_user)):
 
-    voc = db.get_vocabulary(user, id)
-    stats = db.vocabulary_stats(voc)
+    voc = await db.get_vocabulary(user, id)
+    stats = await db.vocabulary_stats(voc, user=user)
 
-    session = db.last_session(user, voc)
-    unfinished_session = None
-    if session is not None and not session.is_finished:
-        unfinished_session = session
+    progress = (await db.vocabulary_progress(user)).get(id)
+    unfinished_session_id = None
+    if progress is not None:
+        unfinished_session_id = progress.unfinished_session_id
 
     return TEMPLATES.TemplateResponse(
         "vocabulary.html",
@@ -104,15 +243,16 @@ async def index(request: Request,
             'voc': voc,
             'stats': stats,
             'voc_id': id,
-            'unfinished_session': unfinished_session
+            'unfinished_session_id': unfinished_session_id
         },
         headers={'Cache-Control': 'no-store'}
     )
 
 @app.get("/index")
 async def index(request: Request, user: User = Depends(get_user)):
-    vocabularies = db.list_vocabularies(user)
-    session_by_vocabulary = {}
+    vocabularies = await db.list_vocabularies(user)
+    progress_by_vocabulary = await db.vocabulary_progress(user)
+    session_id_by_vocabulary = {}
     percentage_by_vocabulary = {}
     vocabularies_by_languages = defaultdict(list)
 
@@ -122,15 +262,13 @@ async def index(request: Request, user: User = Depends(get_user)):
 
         inout = (input_language, output_language)
 
-        session = db.last_session(user, vocabulary)
-        if session is not None and not session.is_finished:
-            session_by_vocabulary[vocabulary] = session
-
-        finished_session = db.last_session(user, vocabulary,
-                                           finished=True)
         percentage_by_vocabulary[vocabulary] = 0.0
-        if finished_session:
-            percentage_by_vocabulary[vocabulary] = finished_session.accuracy
+
+        progress = progress_by_vocabulary.get(voc_id)
+        if progress is not None:
+            if progress.unfinished_session_id is not None:
+                session_id_by_vocabulary[vocabulary] = progress.unfinished_session_id
+            percentage_by_vocabulary[vocabulary] = progress.accuracy
 
         vocabularies_by_languages[inout].append((voc_id, vocabulary))
 
@@ -142,7 +280,7 @@ async def index(request: Request, user: User = Depends(get_user)):
         {
             'request': request,
             'vocabularies_by_languages': vocabularies_by_languages,
-            'session_by_vocabulary': session_by_vocabulary,
+            'session_id_by_vocabulary': session_id_by_vocabulary,
             'percentage_by_vocabulary': percentage_by_vocabulary
         },
         headers={'Cache-Control': 'no-store'}
@@ -154,18 +292,56 @@ async def new_session(request: Request,
                       voc_id: int,
                       user: User = Depends(get_user)):
 
-    voc = db.get_vocabulary(user, voc_id)
+    voc = await db.get_vocabulary(user, voc_id)
+
+    if voc is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='vocabulary not found')
 
-    session = db.create_new_session(user, voc)
+    session = await db.create_new_session(user, voc)
+    sessions.put(session)
 
     return RedirectResponse(url=f'/learn?session_id={session.id}')
 
 
+def offline_session(session: Session, next_seq: int) -> dict:
+    """
+    State of a session to learn it in the browser, the answers are sent
+    back to /words with a seq from next_seq
+    """
+    vocabulary = session.vocabulary
+
+    return {
+        'session_id': session.id,
+        'next_seq': next_seq,
+        'words': [{'word_id': vocabulary.word_id(word),
+                   'word': word.word_input,
+                   'hint': word.word_output,
+                   'answers': sorted(session.accepted_answers(word))}
+                  for word in session.remaining_words],
+        'last_words': [vocabulary.word_id(word) for word in session.last_words],
+        'skip_last_words': Session.SKIP_LAST_WORDS_COUNT - 1,
+        'normalizer': vocabulary.normalizer.rules,
+    }
+
+
 @app.get("/learn")
 async def learn(request: Request,
                 response: Response,
-                session_id: int):
-    session = db.load_session(session_id)
+                session_id: int,
+                offline: bool = False):
+    """
+    :param offline: whether the answers are checked in the browser and
+                    sent in batches
+    """
+    offline_state = None
+
+    async with sessions.lock(session_id):
+        session = await load_session(session_id)
+
+        if offline:
+            last_seq = await db.last_answer_seq(session_id)
+            offline_state = offline_session(session, (last_seq or 0) + 1)
 
     first_word = None
     first_word_id = None
@@ -181,6 +357,8 @@ async def learn(request: Request,
             'request': request,
             'session': session,
             'first_word': first_word,
+            'upcoming_words': [word.dict() for word in upcoming_word_inputs(session)],
+            'offline': offline_state,
         },
         headers={'Cache-Control': 'no-store'}
     )
@@ -190,29 +368,198 @@ async def learn(request: Request,
 
 @app.post("/word")
 async def post_word(word_output: WordOutput):
-    session = db.load_session(word_output.session_id)
+    async with sessions.lock(word_output.session_id):
+        session = await load_session(word_output.session_id, with_attempts=False)
+
+        if session.vocabulary.word(word_output.word_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f'unknown word {word_output.word_id}')
+
+        return await answer_word(session, word_output)
+
+
+@app.post("/words")
+async def post_words(words_input: WordsInput) -> WordsResult:
+    """
+    Apply the answers of a session in order and save them at once
+    """
+    session_id = words_input.session_id
+
+    async with sessions.lock(session_id):
+        session = await load_session(session_id, with_attempts=False)
+        last_seq = await db.last_answer_seq(session_id)
+
+        # the answers are applied all or none
+        vocabulary = session.vocabulary
+        unknown_word_ids = [answer.word_id for answer in words_input.answers
+                            if vocabulary.word(answer.word_id) is None]
+        if unknown_word_ids:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f'unknown words {unknown_word_ids}')
+
+        answers, duplicates = new_answers(words_input.answers, last_seq)
+
+        results = []
+        word_attempts = []
+
+        for answer in answers:
+            word_output = WordOutput(word=answer.word,
+                                     session_id=session_id,
+                                     word_id=answer.word_id)
+            result, word_attempt = guess_word(session, word_output)
+
+            results.append(AnswerResult(seq=answer.seq, **result.dict()))
+            if word_attempt is not None:
+                word_attempts.append(word_attempt)
+
+        if answers:
+            await save_word_attempts(session, word_attempts, answers[-1].seq)
+
+        return WordsResult(results=results,
+                           duplicates=duplicates,
+                           next_word=next_word_input(session),
+                           upcoming_words=upcoming_word_inputs(session))
+
+
+def new_answers(answers: List[WordAnswer],
+                last_seq: Optional[int]) -> Tuple[List[WordAnswer], List[int]]:
+    """
+    Split the answers of a client into the new ones and the duplicates
+
+    :param last_seq: seq of the last answer saved, None if there is none
+    :return: the new answers and the seq of the duplicates
+    """
+    ret = []
+    duplicates = []
+
+    for answer in answers:
+        if last_seq is not None and answer.seq <= last_seq:
+            duplicates.append(answer.seq)
+            continue
+
+        last_seq = answer.seq
+        ret.append(answer)
+
+    return ret, duplicates
+
+
+@app.websocket("/ws/learn")
+async def ws_learn(websocket: WebSocket, session_id: int):
+    """
+    Answer the words of a session over a WebSocket
+
+    The next word is sent when the socket is opened, then a WordResult
+    for every {"word": ..., "word_id": ...} received. The socket of an
+    unknown session is closed with the code 1008.
+    """
+    try:
+        async with sessions.lock(session_id):
+            session = await load_session(session_id, with_attempts=False)
+            first_message = jsonable_encoder({
+                'next_word': next_word_input(session),
+                'upcoming_words': upcoming_word_inputs(session),
+            })
+    except DbException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await websocket.send_json(first_message)
+
+    try:
+        while True:
+            data = await websocket.receive_json()
+
+            try:
+                word_output = WordOutput(**dict(data, session_id=session_id))
+            except (TypeError, ValidationError) as e:
+                await websocket.send_json({'error': str(e)})
+                continue
+
+            async with sessions.lock(session_id):
+                # the session stays in the cache while it is answered
+                session = await load_session(session_id, with_attempts=False)
+
+                result = None
+                if session.vocabulary.word(word_output.word_id) is not None:
+                    result = await answer_word(session, word_output)
+
+            if result is None:
+                await websocket.send_json({'error': f'unknown word {word_output.word_id}'})
+            else:
+                await websocket.send_json(jsonable_encoder(result))
+    except WebSocketDisconnect:
+        pass
+
+
+def next_word_input(session: Session) -> Optional[WordInput]:
+    if session.current_word is None:
+        return None
+
+    next_word = session.current_word
+    vocabulary = session.vocabulary
+    return WordInput(word=next_word.word_input,
+                     word_id=vocabulary.word_id(next_word))
+
+
+def upcoming_word_inputs(session: Session) -> List[WordInput]:
+    vocabulary = session.vocabulary
+
+    return [WordInput(word=word.word_input,
+                      word_id=vocabulary.word_id(word))
+            for word in session.upcoming_words(UPCOMING_WORD_COUNT)]
+
+
+async def answer_word(session: Session, word_output: WordOutput) -> WordResult:
+    """
+    Apply an answer to a session and save it, its lock must be held
+    """
+    result, word_attempt = guess_word(session, word_output)
+
+    if word_attempt is not None:
+        await save_word_attempts(session, [word_attempt])
+
+    return result
+
+
+async def save_word_attempts(session: Session,
+                             word_attempts: List[WordAttempt],
+                             answer_seq: Optional[int] = None):
+    try:
+        await db.add_word_attempts(session, word_attempts, answer_seq)
+    except BaseException:
+        # the cached session has attempts which weren't saved
+        sessions.invalidate(session.id)
+        raise
+
+
+def guess_word(session: Session,
+               word_output: WordOutput) -> Tuple[WordResult, Optional[WordAttempt]]:
+    """
+    Apply an answer to a session without saving it
+
+    :return: the result and the attempt to save, if any
+    """
     vocabulary = session.vocabulary
 
     current_word = vocabulary.word(word_output.word_id)
     hint_word = current_word.word_output
 
-    result = session.guess(current_word, word_output.word)
+    word_attempt = session.guess(current_word, word_output.word, typo_tolerance)
 
     success = False
-    if result is not None:
-        db.add_word_attempt(session, result)
-        success = result.success
-
-    next_word_input = None
-    if session.current_word is not None:
-        next_word = session.current_word
-        vocabulary = session.vocabulary
-        next_word_input = WordInput(word=next_word.word_input,
-                                    word_id=vocabulary.word_id(next_word))
-
-    return WordResult(success=success,
-                      hint=hint_word,
-                      word_input=WordInput(word=current_word.word_input,
-                                           word_id=word_output.word_id),
-                      word_output=word_output,
-                      next_word=next_word_input)
+    near_answer = None
+    if word_attempt is not None:
+        success = word_attempt.success
+        near_answer = word_attempt.near_answer
+
+    result = WordResult(success=success,
+                        hint=hint_word,
+                        near_answer=near_answer,
+                        word_input=WordInput(word=current_word.word_input,
+                                             word_id=word_output.word_id),
+                        word_output=word_output,
+                        next_word=next_word_input(session),
+                        upcoming_words=upcoming_word_inputs(session))
+
+    return result, word_attempt
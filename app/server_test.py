@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+
+DATADIR = tempfile.TemporaryDirectory()
+os.environ['DATADIR'] = DATADIR.name
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import server
+from async_store import AsyncDatabase
+from learn import Vocabulary, Word, Language
+from server import app, new_answers, WordAnswer
+from store import load_database, db
+
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(db.close)
+
+        database = load_database(os.path.join(directory.name, 'learn.db'))
+        for language in Language:
+            database.create_language(language)
+
+        words = [Word(word_input=f'fr_{i}',
+                      word_output=f'de_{i}',
+                      directive=None)
+                 for i in range(1, 4)]
+        voc = Vocabulary(words[0], words, 'fr', 'de')
+        database.create_vocabulary(voc)
+
+        user = database.create_user('test@hotmail.com', 'abc', {Language.FRENCH})
+        self.session = database.create_new_session(user, voc)
+        self.voc = self.session.vocabulary
+
+        server.db = AsyncDatabase(database, 2)
+        server.sessions = server.SessionCache()
+
+        self.client = TestClient(app)
+
+    def _answer(self, seq: int, word: Word, right: bool = True) -> dict:
+        return {'seq': seq,
+                'word_id': self.voc.word_id(word),
+                'word': word.word_output if right else 'bla'}
+
+    def test_new_answers(self):
+        answers = [WordAnswer(seq=seq, word_id=1, word='de_1')
+                   for seq in [1, 2, 2, 3]]
+
+        new, duplicates = new_answers(answers, None)
+        self.assertEqual([1, 2, 3], [answer.seq for answer in new])
+        self.assertEqual([2], duplicates)
+
+        new, duplicates = new_answers(answers, 2)
+        self.assertEqual([3], [answer.seq for answer in new])
+        self.assertEqual([1, 2, 2], duplicates)
+
+    def test_post_words(self):
+        word = self.session.current_word
+        answers = [self._answer(1, word, right=False),
+                   self._answer(2, word)]
+
+        response = self.client.post('/words', json={'session_id': self.session.id,
+                                                    'answers': answers})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([1, 2], [result['seq'] for result in response.json()['results']])
+        self.assertEqual([False, True],
+                         [result['success'] for result in response.json()['results']])
+        self.assertEqual([], response.json()['duplicates'])
+
+        # the client didn't get the response and sends the answers again
+        response = self.client.post('/words', json={'session_id': self.session.id,
+                                                    'answers': answers})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.json()['results'])
+        self.assertEqual([1, 2], response.json()['duplicates'])
+
+        # the answers are sent again with a new one
+        next_word = self.voc.word(response.json()['next_word']['word_id'])
+        response = self.client.post('/words', json={'session_id': self.session.id,
+                                                    'answers': answers + [self._answer(3, next_word)]})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([3], [result['seq'] for result in response.json()['results']])
+        self.assertEqual([1, 2], response.json()['duplicates'])
+
+        session = server.db.database.load_session(self.session.id)
+        self.assertEqual(3, len(session.attempts))
+
+    def test_post_words_unknown_word(self):
+        word = self.session.current_word
+        answers = [self._answer(1, word),
+                   {'seq': 2, 'word_id': 1000, 'word': 'de_1'}]
+
+        response = self.client.post('/words', json={'session_id': self.session.id,
+                                                    'answers': answers})
+        self.assertEqual(404, response.status_code)
+
+        # none of the answers is applied
+        session = server.db.database.load_session(self.session.id)
+        self.assertEqual(0, len(session.attempts))
+        self.assertIsNone(server.db.database.last_answer_seq(self.session.id))
+
+    def test_vocabulary_changed(self):
+        word = self.session.current_word
+
+        with TestClient(app) as client:
+            response = client.post('/word', json={'session_id': self.session.id,
+                                                  'word_id': self.voc.word_id(word),
+                                                  'word': word.word_output})
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(1, server.sessions.stats['sessions'])
+
+            server.db.database.update_word(self.voc, word, word_output='de_new')
+            # the listener runs in the event loop of the server
+            client.get('/stats')
+            self.assertEqual(0, server.sessions.stats['sessions'])
+
+    def test_ws_learn(self):
+        word = self.session.current_word
+
+        with self.client.websocket_connect(f'/ws/learn?session_id={self.session.id}') as websocket:
+            message = websocket.receive_json()
+            self.assertEqual(self.voc.word_id(word), message['next_word']['word_id'])
+
+            websocket.send_json({'word': word.word_output,
+                                 'word_id': self.voc.word_id(word)})
+            result = websocket.receive_json()
+            self.assertTrue(result['success'])
+            self.assertEqual(word.word_output, result['word_output']['word'])
+
+            websocket.send_json({'word': 'bla', 'word_id': 1000})
+            self.assertEqual({'error': 'unknown word 1000'}, websocket.receive_json())
+
+            # the socket stays open
+            next_word = self.voc.word(result['next_word']['word_id'])
+            websocket.send_json({'word': 'bla',
+                                 'word_id': self.voc.word_id(next_word)})
+            self.assertFalse(websocket.receive_json()['success'])
+
+        session = server.db.database.load_session(self.session.id)
+        self.assertEqual(2, len(session.attempts))
+
+    def test_ws_learn_unknown_session(self):
+        with self.assertRaises(WebSocketDisconnect) as context:
+            with self.client.websocket_connect('/ws/learn?session_id=1000'):
+                pass
+
+        self.assertEqual(1008, context.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
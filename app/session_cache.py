@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from collections import OrderedDict
+import time
+from typing import Dict, Optional
+from weakref import WeakValueDictionary
+
+from learn import Session
+
+
+class SessionCache:
+    """
+    Sessions being learned kept in memory by ID
+
+    A session is kept at most ttl seconds after it was last used and only
+    the max_size most recently used ones are kept. The cache is written
+    through: the attempts of a cached session are saved before it is used
+    again, a session whose attempt couldn't be saved must be invalidated.
+
+    It is only used from the event loop of the server.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600.0):
+        self._max_size = max_size
+        self._ttl = ttl
+        # session ID => (expiration, session, with_attempts)
+        self._entries = OrderedDict()
+        # lock of the sessions being answered, to apply one answer at a time
+        self._locks = WeakValueDictionary()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lock(self, session_id: int) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+
+        return lock
+
+    def get(self, session_id: int, with_attempts: bool = True) -> Optional[Session]:
+        """
+        :param with_attempts: whether the attempts of the session are needed
+        """
+        entry = self._entries.get(session_id)
+
+        if entry is not None:
+            expiration, session, has_attempts = entry
+
+            if expiration <= time.monotonic():
+                del self._entries[session_id]
+                self.evictions += 1
+            elif has_attempts or not with_attempts:
+                self._entries[session_id] = (time.monotonic() + self._ttl,
+                                             session, has_attempts)
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return session
+
+        self.misses += 1
+        return None
+
+    def put(self, session: Session, with_attempts: bool = True):
+        """
+        :param with_attempts: whether the session was loaded with its attempts
+        """
+        now = time.monotonic()
+
+        self._entries[session.id] = (now + self._ttl, session, with_attempts)
+        self._entries.move_to_end(session.id)
+
+        # the least recently used sessions are the first ones to expire
+        while self._entries:
+            session_id, (expiration, _, _) = next(iter(self._entries.items()))
+
+            if expiration > now and len(self._entries) <= self._max_size:
+                break
+
+            del self._entries[session_id]
+            self.evictions += 1
+
+    def invalidate(self, session_id: int):
+        self._entries.pop(session_id, None)
+
+    def invalidate_vocabulary(self, voc_id: Optional[int]):
+        """
+        Forget the sessions of a vocabulary which changed
+
+        :param voc_id: None to forget all the sessions
+        """
+        # the vocabulary of a session with several ones has no ID
+        for session_id in [session_id
+                           for session_id, (_, session, _) in self._entries.items()
+                           if voc_id is None or session.vocabulary.id in (voc_id, None)]:
+            del self._entries[session_id]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'sessions': len(self._entries)
+        }
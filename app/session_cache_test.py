@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from learn import Word, Vocabulary, Session
+from session_cache import SessionCache
+
+
+class SessionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        word = Word(word_output='word_output',
+                    word_input='word_input',
+                    directive=None)
+        self.voc = Vocabulary(word, [word], 'fr', 'de')
+
+    def _session(self, session_id: int) -> Session:
+        session = Session([], self.voc)
+        session.set_id(session_id)
+        return session
+
+    def test_get(self):
+        cache = SessionCache()
+        session = self._session(1)
+
+        self.assertIsNone(cache.get(1))
+        cache.put(session)
+        self.assertIs(session, cache.get(1))
+        self.assertIs(session, cache.get(1, with_attempts=False))
+
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1))
+
+        self.assertEqual({'hits': 2, 'misses': 2, 'evictions': 0, 'sessions': 0},
+                         cache.stats)
+
+    def test_without_attempts(self):
+        cache = SessionCache()
+        session = self._session(1)
+
+        cache.put(session, with_attempts=False)
+        self.assertIs(session, cache.get(1, with_attempts=False))
+        self.assertIsNone(cache.get(1))
+
+    def test_evictions(self):
+        cache = SessionCache(max_size=2)
+
+        for session_id in range(3):
+            cache.put(self._session(session_id))
+        self.assertIsNone(cache.get(0))
+        self.assertIsNotNone(cache.get(1))
+        self.assertEqual(1, cache.evictions)
+
+        cache = SessionCache(ttl=0.0)
+        cache.put(self._session(1))
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(1, cache.evictions)
+
+    def test_invalidate_vocabulary(self):
+        cache = SessionCache()
+        self.voc.set_id(1)
+
+        other_word = Word(word_output='other_output',
+                          word_input='other_input',
+                          directive=None)
+        other_voc = Vocabulary(other_word, [other_word], 'fr', 'de')
+        other_voc.set_id(2)
+        other_session = Session([], other_voc.flip())
+        other_session.set_id(2)
+
+        cache.put(self._session(1))
+        cache.put(other_session)
+
+        cache.invalidate_vocabulary(1)
+        self.assertIsNone(cache.get(1))
+        self.assertIs(other_session, cache.get(2))
+
+        cache.invalidate_vocabulary(None)
+        self.assertIsNone(cache.get(2))
+
+    def test_lock(self):
+        cache = SessionCache()
+
+        self.assertIs(cache.lock(1), cache.lock(1))
+        self.assertIsNot(cache.lock(1), cache.lock(2))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=3)
@@ -4,58 +4,320 @@ function update_height() {
   $(".centering-box").css("top", "calc(100% - " + size + "px)");
 }
 
+function show_word(word) {
+  if(word) {
+    $("#current-input").text(word.word);
+    $("#current-output").data("current-word-id", word.word_id);
+    $("#current-output").val("");
+  } else {
+    $("#current-word").hide();
+  }
+}
+
+function show_result(result) {
+  if(result.success) {
+    var new_node = $("#right-word").clone();
+  } else {
+    var new_node = $("#wrong-word").clone();
+  }
+
+  new_node.attr("style", "");
+  new_node.find(".input .field").text(result.word_input.word);
+  new_node.find(".output .field").text(result.word_output.word);
+  if(result.near_answer)
+    new_node.find(".result .field").text(result.hint + " (" + result.near_answer + ")");
+  else
+    new_node.find(".result .field").text(result.hint);
+
+  $(".current").before(new_node);
+
+  if(result.next_word !== undefined)
+    show_word(result.next_word);
+
+  // update the size of the words
+  update_height();
+}
+
+// the words picked after the current one if it is found, the next one is
+// shown while the server answers
+var upcoming_words = [];
+var answers_sent = 0;
+var predicted = false;
+
+function predict_word() {
+  answers_sent++;
+
+  if(upcoming_words.length > 0) {
+    show_word(upcoming_words.shift());
+    predicted = true;
+  }
+}
+
+function receive_result(result) {
+  answers_sent--;
+
+  var next_word = result.next_word;
+  delete result.next_word;
+  show_result(result);
+
+  // the answers sent since then have newer words
+  if(answers_sent > 0)
+    return;
+
+  upcoming_words = result.upcoming_words || [];
+
+  // the predicted word can still be answered once it is typed
+  var current_output = $("#current-output");
+  if(!predicted || current_output.val() == "" ||
+     !next_word || current_output.data("current-word-id") == next_word.word_id)
+    show_word(next_word);
+
+  predicted = false;
+}
+
+// the answers are sent over a WebSocket when it is open, with /word otherwise
+var socket = null;
+
+function open_socket(session_id) {
+  if(!window.WebSocket)
+    return;
+
+  var protocol = window.location.protocol == "https:" ? "wss:" : "ws:";
+  var ws = new WebSocket(protocol + "//" + window.location.host +
+                         "/ws/learn?session_id=" + session_id);
+
+  ws.onopen = function() {
+    socket = ws;
+  };
+  ws.onmessage = function(e) {
+    var result = JSON.parse(e.data);
+
+    // the first message only has the next words and the invalid
+    // answers only an error
+    if(result.word_input)
+      receive_result(result);
+    else if(result.upcoming_words && answers_sent == 0)
+      upcoming_words = result.upcoming_words;
+    else if(result.error)
+      answers_sent--;
+  };
+  ws.onclose = function() {
+    socket = null;
+    answers_sent = 0;
+  };
+}
+
+// offline: the answers are checked here and sent to /words in batches,
+// they are kept in the local storage until the server saved them
+var offline = null;
+
+var OFFLINE_BATCH_SIZE = 10;
+var OFFLINE_SYNC_INTERVAL = 30000;
+
+function offline_key() {
+  return "offline-answers-" + offline.session_id;
+}
+
+function offline_answers() {
+  return JSON.parse(window.localStorage.getItem(offline_key()) || "[]");
+}
+
+function pick_offline_word() {
+  if(offline.words.length == 0)
+    return null;
+
+  var possible_words = offline.words.slice();
+
+  for(var i = offline.last_words.length - 1; i >= 0; i--) {
+    if(possible_words.length == 1)
+      break;
+
+    possible_words = possible_words.filter(function(word) {
+      return word.word_id != offline.last_words[i];
+    });
+  }
+
+  return possible_words[Math.floor(Math.random() * possible_words.length)];
+}
+
+function offline_word(word_id) {
+  return offline.words.find(function(word) {
+    return word.word_id == word_id;
+  });
+}
+
+// same as the Normalizer of the output language (see normalize.py)
+function normalize_offline(text) {
+  var rules = offline.normalizer;
+
+  text = text.toLowerCase().normalize(rules.fold_width ? "NFKC" : "NFC");
+
+  text = Array.from(text).map(function(character) {
+    if(rules.transliterations.hasOwnProperty(character))
+      return rules.transliterations[character];
+    if(rules.punctuation.indexOf(character) >= 0)
+      return " ";
+    return character;
+  }).join("");
+
+  if(rules.fold_accents)
+    text = text.normalize("NFKD").replace(/\p{M}/gu, "");
+
+  var words = text.split(/\s+/).filter(function(word) {
+    return word.length > 0;
+  });
+  return words.join(rules.remove_spaces ? "" : " ");
+}
+
+function guess_offline(word_id, output) {
+  var word = offline_word(word_id);
+  var success = word.answers.indexOf(normalize_offline(output)) >= 0;
+
+  offline.last_words.push(word_id);
+  offline.last_words = offline.last_words.slice(-offline.skip_last_words);
+
+  if(success) {
+    offline.words = offline.words.filter(function(other) {
+      return other.word_id != word_id;
+    });
+  }
+
+  var next_word = pick_offline_word();
+
+  var answers = offline_answers();
+  answers.push({
+    "seq": offline.next_seq++,
+    "word_id": word_id,
+    "word": output,
+    "success": success
+  });
+  window.localStorage.setItem(offline_key(), JSON.stringify(answers));
+
+  show_result({
+    "success": success,
+    "word_input": {"word_id": word_id, "word": word.word},
+    "word_output": {"word": output, "session_id": offline.session_id, "word_id": word_id},
+    "hint": word.hint,
+    "next_word": next_word ? {"word_id": next_word.word_id, "word": next_word.word} : null
+  });
+
+  if(answers.length >= OFFLINE_BATCH_SIZE || !next_word)
+    sync_offline();
+}
+
+var syncing = false;
+
+function sync_offline(done) {
+  var answers = offline_answers();
+
+  if(syncing || answers.length == 0)
+    return;
+  syncing = true;
+
+  $.ajax({
+    url: "/words",
+    method: "POST",
+    contentType: 'application/json',
+    processData: false,
+    data: JSON.stringify({
+      "session_id": offline.session_id,
+      "answers": answers.map(function(answer) {
+        return {"seq": answer.seq, "word_id": answer.word_id, "word": answer.word};
+      })
+    })
+  }).done(function(result) {
+    var last_seq = answers[answers.length - 1].seq;
+
+    window.localStorage.setItem(offline_key(), JSON.stringify(
+      offline_answers().filter(function(answer) {
+        return answer.seq > last_seq;
+      })));
+
+    // the server checked the answers again, the page is reloaded
+    // when it disagrees
+    var agreed = result.results.every(function(server_result) {
+      var answer = answers.find(function(answer) {
+        return answer.seq == server_result.seq;
+      });
+      return answer.success == server_result.success;
+    });
+
+    if(!agreed || done)
+      window.location.reload();
+  }).always(function() {
+    syncing = false;
+  });
+}
+
+function start_offline() {
+  offline = JSON.parse($("#offline-session").text());
+
+  // answers of a previous page which weren't sent yet
+  if(offline_answers().length > 0) {
+    sync_offline(true);
+    return;
+  }
+
+  setInterval(sync_offline, OFFLINE_SYNC_INTERVAL);
+  $(window).on("online", function() {
+    sync_offline();
+  });
+}
+
+function send_word(session_id, word_id, output) {
+  if(offline) {
+    guess_offline(word_id, output);
+    return;
+  }
+
+  if(socket && socket.readyState == WebSocket.OPEN) {
+    socket.send(JSON.stringify({
+      "word": output,
+      "word_id": word_id
+    }));
+    predict_word();
+    return;
+  }
+
+  $.ajax({
+    url: "/word",
+    method: "POST",
+    contentType: 'application/json',
+    processData: false,
+    data: JSON.stringify({
+      "word": output,
+      "session_id": session_id,
+      "word_id": word_id
+    })
+  }).done(receive_result).fail(function() {
+    answers_sent--;
+  });
+  predict_word();
+}
+
 $(document).ready(function() {
   update_height();
 
+  var session_id = $("#current-output").data("session-id");
+  upcoming_words = $("#current-output").data("upcoming-words") || [];
+
+  if($("#offline-session").length > 0)
+    start_offline();
+  else if(session_id !== undefined)
+    open_socket(session_id);
+
   $("#current-output").keyup(function(e) {
 
     if($(this).attr('readonly'))
       return;
 
     if(e.which == 13) {
-      var current_input = $("#current-input");
       var current_output = $("#current-output");
       var output = current_output.val();
       var session_id = current_output.data("session-id");
       var current_word_id = current_output.data("current-word-id");
 
-      $.ajax({
-        url: "/word",
-        method: "POST",
-        contentType: 'application/json',
-        processData: false,
-        data: JSON.stringify({
-          "word": output,
-          "session_id": session_id,
-          "word_id": current_word_id
-        })
-      }).done(function(result) {
-
-        if(result.success) {
-          var new_node = $("#right-word").clone();
-        } else {
-          var new_node = $("#wrong-word").clone();
-        }
-
-        new_node.attr("style", "");
-        new_node.find(".input .field").text(result.word_input.word);
-        new_node.find(".output .field").text(result.word_output.word);
-        new_node.find(".result .field").text(result.hint);
-
-        $(".current").before(new_node);
-
-        if(result.next_word) {
-          current_input.text(result.next_word.word)
-          current_input.text(result.next_word.word)
-          current_output.data("current-word-id", result.next_word.word_id);
-          current_output.val("");
-        } else {
-          $("#current-word").hide();
-        }
-
-        // update the size of the words
-        update_height();
-      });
+      send_word(session_id, current_word_id, output);
     }
   });
 
@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 
 from collections import defaultdict
-from security import check_password, get_hashed_password
-from typing import Dict, Optional, Set
+from dataclasses import dataclass
+import json
+import threading
+from security import check_password, get_hashed_password, CredentialCache
+from journal import Journal
+from typing import Any, Callable, Dict, List, Optional, Set
 from datetime import date, datetime
 from peewee import *
+from playhouse.migrate import SqliteMigrator, migrate
 
-from learn import Vocabulary, Word, Session, WordAttempt
+from learn import Vocabulary, Word, Session, WordAttempt, SessionState
 from learn import Language, User, VocabularyStats
 
 db = SqliteDatabase(None)
@@ -25,7 +30,7 @@ class DbLanguage(Model):
 
 
 class DbUser(Model):
-    email = CharField()
+    email = CharField(index=True)
     password = CharField()
 
     class Meta:
@@ -63,9 +68,23 @@ class DbSession(Model):
     current_word = ForeignKeyField(DbWord, null=True)
     creation = DateTimeField()
     finished = BooleanField()
+    # sequence number of the last answer sent by the client in a batch
+    answer_seq = IntegerField(null=True)
+    # seed of the words picked (see Session)
+    seed = IntegerField(null=True)
+
+    # summary of the session, set once it is finished
+    attempt_count = IntegerField(null=True)
+    error_count = IntegerField(null=True)
+    words_in_error = IntegerField(null=True)
+    accuracy = FloatField(null=True)
+    finish_time = DateTimeField(null=True)
 
     class Meta:
         database = db
+        indexes = (
+            (('user', 'finished'), False),
+        )
 
 
 class DbVocabularySession(Model):
@@ -75,6 +94,9 @@ class DbVocabularySession(Model):
 
     class Meta:
         database = db
+        indexes = (
+            (('vocabulary', 'session'), False),
+        )
 
 
 class DbWordAttempt(Model):
@@ -88,27 +110,312 @@ class DbWordAttempt(Model):
         database = db
 
 
+class DbSessionState(Model):
+    """
+    State derived from the attempts of a session (see SessionState), with
+    its words in DbSessionWord
+
+    The last words are stored as a JSON list of word IDs. The state is
+    stale when last_attempt isn't the last attempt of the session or when
+    the vocabulary doesn't have word_count words anymore.
+    """
+    session = ForeignKeyField(DbSession, primary_key=True, backref='state')
+    last_words = TextField()
+    word_count = IntegerField()
+    last_attempt = IntegerField(null=True)
+    pick_count = IntegerField(default=0)
+
+    class Meta:
+        database = db
+
+
+class DbSessionWord(Model):
+    """
+    Errors of a word in a session and the attempt which found it, saved
+    with the state of the session for the words with an attempt
+    """
+    session = ForeignKeyField(DbSession, backref='words')
+    word = ForeignKeyField(DbWord)
+    error_count = IntegerField(default=0)
+    found_attempt = IntegerField(null=True)
+
+    class Meta:
+        database = db
+        primary_key = CompositeKey('session', 'word')
+
+
+class DbJournalCheckpoint(Model):
+    """
+    Sequence number of the last record of the journal written to the
+    database, the records up to it are skipped when the journal is replayed
+    """
+    seq = IntegerField()
+
+    class Meta:
+        database = db
+
+
+class DbCatalogVersion(Model):
+    """
+    Version of the vocabularies, increased by every change of a vocabulary
+    or of its words for the other processes to reload them
+    """
+    version = IntegerField()
+
+    class Meta:
+        database = db
+
+
+class DbSchemaVersion(Model):
+    version = IntegerField(primary_key=True)
+    applied = DateTimeField()
+
+    class Meta:
+        database = db
+
+
+MODELS = [DbVocabulary, DbWord, DbUser,
+          DbVocabularySession, DbSession,
+          DbWordAttempt, DbLanguage, DbSpeak,
+          DbSessionState, DbSessionWord, DbJournalCheckpoint, DbCatalogVersion]
+
+
+@dataclass(frozen=True)
+class VocabularyProgress:
+    vocabulary_id: int
+    # the last session of the vocabulary if it isn't finished
+    unfinished_session_id: Optional[int]
+    # accuracy of the last finished session (0.0 without one)
+    accuracy: float
+
+
+@dataclass(frozen=True)
+class SessionSummary:
+    session_id: int
+    attempt_count: int
+    error_count: int
+    words_in_error: int
+    accuracy: float
+    finish_time: datetime
+
+
+class VocabularyCatalog:
+    """
+    Vocabularies of the database kept in memory by ID, their flipped
+    version is a view kept by the vocabulary
+
+    The catalog is updated by the Database of this process, it is emptied
+    when the vocabularies were changed by another one (see DbCatalogVersion).
+    The listeners are called with the ID of a vocabulary changed, or None
+    when they all may have changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._vocabularies = {}
+        self._ids = None
+        # version of the vocabularies in the database when they were cached
+        self._version = None
+        self._listeners: List[Callable[[Optional[int]], None]] = []
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ids(self) -> Optional[Set[int]]:
+        """
+        :return: the IDs of all the vocabularies or None if they
+                 weren't listed yet
+        """
+        with self._lock:
+            return None if self._ids is None else set(self._ids)
+
+    def check_version(self, version: int):
+        """
+        Empty the catalog if the vocabularies changed since it was filled
+        """
+        with self._lock:
+            if version != self._version:
+                self._vocabularies = {}
+                self._ids = None
+
+                if self._version is not None:
+                    self._changed(None)
+                self._version = version
+
+    def add_listener(self, listener: Callable[[Optional[int]], None]):
+        """
+        :param listener: called with the lock of the catalog held, from
+                         the thread changing the vocabularies
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _changed(self, voc_id: Optional[int]):
+        for listener in self._listeners:
+            listener(voc_id)
+
+    def changed(self, version: int):
+        """
+        Take the version written by this process, the catalog is only
+        emptied if it missed the one before of another process
+        """
+        with self._lock:
+            self.check_version(version - 1)
+            self._version = version
+
+    def reset(self, vocabularies: List[Vocabulary]):
+        with self._lock:
+            self._vocabularies = {voc.id: voc for voc in vocabularies}
+            self._ids = set(self._vocabularies)
+
+    def get(self, voc_id: int, flipped: bool = False) -> Optional[Vocabulary]:
+        with self._lock:
+            voc = self._vocabularies.get(voc_id)
+
+            if voc is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+            if not flipped:
+                return voc
+
+            return self.flipped(voc_id)
+
+    def flipped(self, voc_id: int) -> Vocabulary:
+        """
+        :return: the flipped version of a vocabulary in the catalog
+        """
+        with self._lock:
+            return self._vocabularies[voc_id].flip()
+
+    def put(self, voc: Vocabulary):
+        with self._lock:
+            self._vocabularies[voc.id] = voc
+
+            if self._ids is not None:
+                self._ids.add(voc.id)
+
+    def invalidate(self, voc_id: int):
+        """
+        Forget the words of an existing vocabulary, they are loaded
+        again when needed
+        """
+        with self._lock:
+            self._vocabularies.pop(voc_id, None)
+
+            if self._ids is not None:
+                self._ids.add(voc_id)
+
+            self._changed(voc_id)
+
+    def remove(self, voc_id: int):
+        with self._lock:
+            self._vocabularies.pop(voc_id, None)
+
+            if self._ids is not None:
+                self._ids.discard(voc_id)
+
+            self._changed(voc_id)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'vocabularies': len(self._vocabularies)
+            }
+
+
 class Database:
 
+    def __init__(self, journal: Optional[Journal] = None):
+        """
+        :param journal: journal of the word attempts, they are written to
+                        the database by flush_journal when one is given
+        """
+        self._catalog = VocabularyCatalog()
+        self._credentials = CredentialCache()
+
+        self._journal = journal
+        # records of the journal not written to the database yet by session
+        self._pending_records: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        if journal is not None:
+            for record in journal.recovered():
+                self._pending_records[record['session']].append(record)
+
+    @property
+    def catalog(self) -> VocabularyCatalog:
+        return self._catalog
+
+    @property
+    def credentials(self) -> CredentialCache:
+        return self._credentials
+
+    @property
+    def journal(self) -> Optional[Journal]:
+        return self._journal
+
     def create_language(self, language: Language):
         code = language.code
         name = language.name
 
         DbLanguage.create(code=code, name=name)
 
-    def get_user(self, email: str, password: str) -> DbUser:
-        users = list(DbUser.select().where(DbUser.email == email))
+    def get_user(self, email: str, password: str) -> User:
+        """
+        The languages of the users whose password was checked recently
+        are cached with the hash of their password, to not check their
+        password again while the hash is the same
+        """
+        cached = self._credentials.get(email, password)
 
-        if not users or not check_password(password, users[0].password):
-            raise DbException('user not found')
+        if cached is not None:
+            hash_password, languages = cached
+
+            # the password may have been changed by another process
+            stored_hash_password = (DbUser
+                                    .select(DbUser.password)
+                                    .where(DbUser.email == email)
+                                    .scalar())
+            if stored_hash_password != hash_password:
+                cached = None
+
+        if cached is None:
+            users = list(DbUser.select().where(DbUser.email == email))
+
+            if not users or not check_password(password, users[0].password):
+                raise DbException('user not found')
+
+            db_user = users[0]
+            languages = set()
 
-        db_user = users[0]
-        languages = set()
+            for speak in DbSpeak.select().where(DbSpeak.user == db_user):
+                languages.add(Language.from_code(speak.language_id))
 
-        for speak in DbSpeak.select().where(DbSpeak.user == db_user):
-            languages.add(Language.from_code(speak.language.code))
+            languages = frozenset(languages)
+            self._credentials.put(email, password, (db_user.password, languages))
 
-        return User(email=email, password=password, languages_spoken=languages)
+        return User(email=email, password=password, languages_spoken=set(languages))
+
+    def change_password(self, email: str, password: str):
+        hash_password = get_hashed_password(password)
+
+        updated = (DbUser
+                   .update(password=hash_password)
+                   .where(DbUser.email == email)
+                   .execute())
+
+        if not updated:
+            raise DbException('user not found')
+
+        self._credentials.invalidate(email)
 
     def create_user(self,
                     email: str,
@@ -135,72 +442,483 @@ class Database:
 
     def create_new_session(self,
                            user: User,
-                           voc: Vocabulary) -> Session:
+                           voc: Vocabulary,
+                           seed: Optional[int] = None) -> Session:
+        """
+        :param seed: seed of the words picked, a random one by default
+        """
         db_user = self._get_db_user(user)
-        new_session = Session([], voc)
-
-        new_db_session = DbSession.create(user=db_user.id,
-                                          creation=datetime.now(),
-                                          finished=len(voc) == 0)
-        new_session.set_id(new_db_session.id)
-        DbVocabularySession.create(session=new_db_session,
-                                   vocabulary=voc.id,
-                                   flipped=voc.is_flipped)
-        current_db_word = self._get_db_word(new_session,
-                                            new_session.current_word)
-        db_session = DbSession.get(new_db_session.id)
-        db_session.current_word = current_db_word
-        db_session.save()
+        new_session = Session([], voc, seed=seed)
 
-        return new_session
+        current_word_id = self._word_id(new_session, new_session.current_word)
 
-    def _get_db_word(self,
-                     session: Session,
-                     word: Word) -> Optional[DbWord]:
+        with db.atomic():
+            # the vocabulary may have been removed by another process
+            if DbVocabulary.get_or_none(DbVocabulary.id == voc.id) is None:
+                raise DbException('vocabulary not found')
 
-        word_input, word_output = word.word_input, word.word_output
-        directive = word.directive
+            new_db_session = DbSession.create(user=db_user.id,
+                                              current_word=current_word_id,
+                                              creation=datetime.now(),
+                                              finished=len(voc) == 0,
+                                              seed=new_session.seed)
+            new_session.set_id(new_db_session.id)
+            DbVocabularySession.create(session=new_db_session,
+                                       vocabulary=voc.id,
+                                       flipped=voc.is_flipped)
 
-        if session.is_flipped:
-            word_input, word_output = word_output, word_input
+            self._save_session_state(new_session.id, None,
+                                     self._session_state_row(new_session))
 
-        for row in (DbWord.select()
-                    .join(DbVocabulary)
-                    .join(DbVocabularySession)
-                    .join(DbSession)
-                    .where(DbSession.id == session.id)
-                    .where(DbWord.word_input == word_input)
-                    .where(DbWord.word_output == word_output)
-                    .where(DbWord.directive == directive)):
-            return row
+        return new_session
+
+    def _word_id(self,
+                 session: Session,
+                 word: Optional[Word]) -> Optional[int]:
+        if word is None:
+            return None
 
-        assert False
-        return None
+        word_id = session.vocabulary.word_id(word)
+        assert word_id is not None
+        return word_id
 
     def add_word_attempt(self,
                          session: Session,
                          word_attempt: WordAttempt):
+        self.add_word_attempts(session, [word_attempt])
+
+    def add_word_attempts(self,
+                          session: Session,
+                          word_attempts: List[WordAttempt],
+                          answer_seq: Optional[int] = None):
+        """
+        Save the attempts of a session at once, they were applied to it
+        in this order
+
+        :param answer_seq: sequence number of the last answer of the client,
+                           see last_answer_seq
+        """
         session_id = session.id
-        word = word_attempt.word
 
+        word_ids = []
+        for word_attempt in word_attempts:
+            word_id = word_attempt.word_id
+            if word_id is None:
+                word_id = self._word_id(session, word_attempt.word)
+            word_ids.append(word_id)
+
+        if self._journal is not None:
+            self._journal_word_attempts(session, word_attempts,
+                                        word_ids, answer_seq)
+            return
+
+        with db.atomic():
+            current_word_id = self._word_id(session, session.current_word)
+
+            columns = {'current_word': current_word_id,
+                       'finished': session.is_finished}
+            if answer_seq is not None:
+                columns['answer_seq'] = answer_seq
+
+            (DbSession
+             .update(**columns)
+             .where(DbSession.id == session_id)
+             .execute())
+
+            self._insert_attempts(session_id,
+                                  [{'word': word_id,
+                                    'typed_word': word_attempt.typed_word,
+                                    'success': word_attempt.success,
+                                    'time': datetime.now()}
+                                   for word_attempt, word_id in zip(word_attempts, word_ids)],
+                                  self._session_state_row(session))
+
+            if session.is_finished:
+                self.summarize_sessions([session_id])
+
+    def last_answer_seq(self, session_id: int) -> Optional[int]:
+        """
+        :return: the sequence number of the last answer of the client
+                 saved for a session, the answers up to it are duplicates
+        """
+        for record in reversed(self._pending_records_of(session_id)):
+            if record['answer_seq'] is not None:
+                return record['answer_seq']
+
+        return DbSession.get(session_id).answer_seq
+
+    def _journal_word_attempts(self,
+                               session: Session,
+                               word_attempts: List[WordAttempt],
+                               word_ids: List[int],
+                               answer_seq: Optional[int]):
+        # one record for all the attempts, they are replayed all or none
+        record = {
+            'session': session.id,
+            'attempts': [{'word': word_id,
+                          'typed_word': word_attempt.typed_word,
+                          'success': word_attempt.success,
+                          'time': datetime.now().isoformat()}
+                         for word_attempt, word_id in zip(word_attempts, word_ids)],
+            'current_word': self._word_id(session, session.current_word),
+            'finished': session.is_finished,
+            'state': self._session_state_row(session),
+            'answer_seq': answer_seq,
+        }
+
+        # the record is pending as soon as it is numbered, a flush can't
+        # checkpoint a later record without it
+        def add_pending(numbered_record: Dict[str, Any]):
+            with self._pending_lock:
+                self._pending_records[session.id].append(numbered_record)
+
+        # durable once appended, the sessions are read from the pending
+        # records until they are flushed
+        self._journal.append(record, add_pending)
+
+    def _pending_records_of(self, session_id: int) -> List[Dict[str, Any]]:
+        with self._pending_lock:
+            return list(self._pending_records.get(session_id, []))
+
+    def _journal_checkpoint(self) -> int:
+        return DbJournalCheckpoint.select(fn.MAX(DbJournalCheckpoint.seq)).scalar() or 0
+
+    def flush_journal(self) -> int:
+        """
+        Write the pending records of the journal to the database in one
+        transaction
+
+        :return: number of word attempts written
+        """
+        if self._journal is None:
+            return 0
+
+        with self._flush_lock:
+            with self._pending_lock:
+                records = sorted((record
+                                  for session_records in self._pending_records.values()
+                                  for record in session_records),
+                                 key=lambda record: record['seq'])
+
+            if not records:
+                return 0
+
+            last_seq = records[-1]['seq']
+
+            with db.atomic():
+                # the records up to the checkpoint were written before a crash
+                checkpoint = self._journal_checkpoint()
+                records = [record for record in records if record['seq'] > checkpoint]
+
+                self._write_records(records)
+
+                DbJournalCheckpoint.delete().execute()
+                DbJournalCheckpoint.create(seq=last_seq)
+
+            attempt_count = sum(len(record['attempts']) for record in records)
+
+            with self._pending_lock:
+                for session_id in list(self._pending_records):
+                    session_records = [record
+                                       for record in self._pending_records[session_id]
+                                       if record['seq'] > last_seq]
+                    if session_records:
+                        self._pending_records[session_id] = session_records
+                    else:
+                        del self._pending_records[session_id]
+
+            self._journal.checkpoint(last_seq)
+
+        return attempt_count
+
+    def _write_records(self, records: List[Dict[str, Any]]):
+        last_records = {}
+
+        answer_seqs = {}
+
+        for record in records:
+            session_id = record['session']
+
+            self._insert_attempts(session_id,
+                                  [dict(attempt, time=datetime.fromisoformat(attempt['time']))
+                                   for attempt in record['attempts']],
+                                  record['state'])
+
+            last_records[session_id] = record
+            if record['answer_seq'] is not None:
+                answer_seqs[session_id] = record['answer_seq']
+
+        for session_id, record in last_records.items():
+            columns = {'current_word': record['current_word'],
+                       'finished': record['finished']}
+            if session_id in answer_seqs:
+                columns['answer_seq'] = answer_seqs[session_id]
+
+            (DbSession
+             .update(**columns)
+             .where(DbSession.id == session_id)
+             .execute())
+
+        finished = [session_id
+                    for session_id, record in last_records.items()
+                    if record['finished']]
+        if finished:
+            self.summarize_sessions(finished)
+
+    def summarize_sessions(self, session_ids: Optional[List[int]] = None) -> int:
+        """
+        Compute the summary of finished sessions from their attempts
+
+        :param session_ids: sessions to summarize, all by default
+        :return: number of sessions summarized
+        """
+        errors = Case(None, [(~DbWordAttempt.success, 1)], 0)
+        words_in_error = Case(None, [(~DbWordAttempt.success, DbWordAttempt.word)])
+
+        query = (DbSession
+                 .select(DbSession.id,
+                         DbSession.creation,
+                         fn.COUNT(DbWordAttempt.id).alias('attempt_count'),
+                         fn.SUM(errors).alias('error_count'),
+                         fn.COUNT(words_in_error.distinct()).alias('words_in_error'),
+                         fn.COUNT(DbWordAttempt.word.distinct()).alias('words'),
+                         fn.MAX(DbWordAttempt.time).alias('finish_time'))
+                 .join(DbWordAttempt, JOIN.LEFT_OUTER)
+                 .where(DbSession.finished == True)
+                 .group_by(DbSession.id))
+
+        if session_ids is not None:
+            query = query.where(DbSession.id.in_(session_ids))
+
+        count = 0
+
+        with db.atomic():
+            for row in query.dicts():
+                # all the words of a finished session were found
+                accuracy = 100.0
+                if row['words']:
+                    accuracy -= row['words_in_error'] / row['words'] * 100.0
+
+                (DbSession
+                 .update(attempt_count=row['attempt_count'],
+                         error_count=row['error_count'] or 0,
+                         words_in_error=row['words_in_error'],
+                         accuracy=accuracy,
+                         finish_time=row['finish_time'] or row['creation'])
+                 .where(DbSession.id == row['id'])
+                 .execute())
+                count += 1
+
+        return count
+
+    def session_summary(self, session_id: int) -> Optional[SessionSummary]:
+        """
+        :return: the summary of a finished session
+        """
         db_session = DbSession.get(session_id)
 
-        if session.current_word is None:
-            db_session.current_word = None
+        if not db_session.finished or db_session.accuracy is None:
+            return None
+
+        return SessionSummary(session_id=session_id,
+                              attempt_count=db_session.attempt_count,
+                              error_count=db_session.error_count,
+                              words_in_error=db_session.words_in_error,
+                              accuracy=db_session.accuracy,
+                              finish_time=db_session.finish_time)
+
+    def _session_state_row(self, session: Session) -> Dict[str, Any]:
+        """
+        :return: the columns of DbSessionState for the state of a session,
+                 its words are saved with each attempt
+        """
+        voc = session.vocabulary
+        last_words = [voc.word_id(word) for word in session.last_words]
+
+        return {
+            'last_words': json.dumps(last_words),
+            'word_count': len(voc),
+            'pick_count': session.pick_count,
+        }
+
+    def _save_session_state(self,
+                            session_id: int,
+                            last_attempt_id: Optional[int],
+                            row: Dict[str, Any]):
+        (DbSessionState
+         .replace(session=session_id,
+                  last_attempt=last_attempt_id,
+                  last_words=row['last_words'],
+                  word_count=row['word_count'],
+                  pick_count=row['pick_count'])
+         .execute())
+
+    def _last_attempt_id(self, session_id: int) -> Optional[int]:
+        return (DbWordAttempt
+                .select(fn.MAX(DbWordAttempt.id))
+                .where(DbWordAttempt.session == session_id)
+                .scalar())
+
+    def _insert_attempts(self,
+                         session_id: int,
+                         attempts: List[Dict[str, Any]],
+                         state_row: Dict[str, Any]):
+        """
+        Insert the attempts of a session with the changes of its state
+
+        :param attempts: the columns of DbWordAttempt
+        :param state_row: the columns of DbSessionState after the attempts
+
+        The changes are only saved on top of a state which isn't stale, a
+        stale state is rebuilt when the session is loaded.
+        """
+        if not attempts:
+            return
+
+        db_state = DbSessionState.get_or_none(DbSessionState.session == session_id)
+        is_current = (db_state is not None and
+                      db_state.last_attempt == self._last_attempt_id(session_id))
+
+        db_attempt = None
+        for attempt in attempts:
+            db_attempt = DbWordAttempt.create(session=session_id, **attempt)
+
+            if is_current:
+                self._save_session_word(session_id, attempt['word'],
+                                        attempt['success'], db_attempt.id)
+
+        if is_current:
+            self._save_session_state(session_id, db_attempt.id, state_row)
+
+    def _save_session_word(self,
+                           session_id: int,
+                           word_id: int,
+                           success: bool,
+                           attempt_id: int):
+        if success:
+            columns = {'found_attempt': attempt_id}
+            # the word is found by its first right attempt
+            update = {DbSessionWord.found_attempt:
+                      fn.COALESCE(DbSessionWord.found_attempt, attempt_id)}
         else:
-            current_word = session.current_word
-            db_session.current_word = self._get_db_word(session, current_word)
+            columns = {'error_count': 1}
+            update = {DbSessionWord.error_count: DbSessionWord.error_count + 1}
+
+        (DbSessionWord
+         .insert(session=session_id, word=word_id, **columns)
+         .on_conflict(conflict_target=[DbSessionWord.session, DbSessionWord.word],
+                      update=update)
+         .execute())
+
+    def _rebuild_session_words(self, session_id: int):
+        """
+        Save again the words of a session from all its attempts
+        """
+        errors = Case(None, [(~DbWordAttempt.success, 1)], 0)
+        found_attempt = Case(None, [(DbWordAttempt.success, DbWordAttempt.id)])
+
+        query = (DbWordAttempt
+                 .select(DbWordAttempt.session,
+                         DbWordAttempt.word,
+                         fn.SUM(errors),
+                         fn.MIN(found_attempt))
+                 .where(DbWordAttempt.session == session_id)
+                 .group_by(DbWordAttempt.word))
+
+        DbSessionWord.delete().where(DbSessionWord.session == session_id).execute()
+        (DbSessionWord
+         .insert_from(query, [DbSessionWord.session, DbSessionWord.word,
+                              DbSessionWord.error_count, DbSessionWord.found_attempt])
+         .execute())
+
+    def _load_session_state(self,
+                            session_id: int,
+                            voc: Vocabulary,
+                            words_by_id: Dict[int, Word],
+                            current_word: Optional[Word],
+                            records: List[Dict[str, Any]]) -> Optional[SessionState]:
+        """
+        :param records: the pending records of the journal of the session,
+                        applied on top of the state saved
+        :return: the state saved for the session or None if it is missing
+                 or stale
+        """
+        db_state = DbSessionState.get_or_none(DbSessionState.session == session_id)
+
+        if db_state is None:
+            return None
 
-        db_session.finished = session.is_finished
-        db_session.save()
+        if db_state.last_attempt != self._last_attempt_id(session_id):
+            return None
 
-        db_word = self._get_db_word(session, word)
+        row = {
+            'last_words': db_state.last_words,
+            'word_count': db_state.word_count,
+            'pick_count': db_state.pick_count,
+        }
+
+        found_attempts = []
+        error_counts = defaultdict(int)
+
+        for word_id, error_count, found_attempt in (DbSessionWord
+                                                    .select(DbSessionWord.word,
+                                                            DbSessionWord.error_count,
+                                                            DbSessionWord.found_attempt)
+                                                    .where(DbSessionWord.session == session_id)
+                                                    .tuples()):
+            if found_attempt is not None:
+                found_attempts.append((found_attempt, word_id))
+            if error_count:
+                error_counts[word_id] = error_count
+
+        found_word_ids = [word_id for _, word_id in sorted(found_attempts)]
+        found = set(found_word_ids)
+
+        for record in records:
+            for attempt in record['attempts']:
+                if not attempt['success']:
+                    error_counts[attempt['word']] += 1
+                elif attempt['word'] not in found:
+                    found_word_ids.append(attempt['word'])
+                    found.add(attempt['word'])
+            row = record['state']
+
+        return self._session_state_from(row, found_word_ids, error_counts,
+                                        voc, words_by_id, current_word)
+
+    def _session_state_from(self,
+                            row: Dict[str, Any],
+                            found_word_ids: List[int],
+                            error_counts: Dict[int, int],
+                            voc: Vocabulary,
+                            words_by_id: Dict[int, Word],
+                            current_word: Optional[Word]) -> Optional[SessionState]:
+        """
+        :param row: the columns of DbSessionState
+        :param found_word_ids: the words found in the order they were found
+        :param error_counts: the number of errors by word ID
+        """
+        if row['word_count'] != len(voc):
+            return None
 
-        DbWordAttempt.create(word=db_word.id,
-                             typed_word=word_attempt.typed_word,
-                             session=session_id,
-                             time=datetime.now(),
-                             success=word_attempt.success)
+        try:
+            found_words = [words_by_id[word_id] for word_id in found_word_ids]
+            error_count_by_word = {words_by_id[word_id]: count
+                                   for word_id, count in error_counts.items()}
+            last_words = [words_by_id[word_id]
+                          for word_id in json.loads(row['last_words'])]
+        except KeyError:
+            # a word was removed from the vocabulary
+            return None
+
+        if current_word is not None and current_word in set(found_words):
+            return None
+
+        return SessionState(found_words=found_words,
+                            error_count_by_word=error_count_by_word,
+                            last_words=last_words,
+                            current_word=current_word,
+                            pick_count=row['pick_count'])
 
     def last_session(self,
                      user: User,
@@ -229,16 +947,150 @@ class Database:
 
         return self.load_session(session_to_load.id)
 
-    def load_session(self, session_id: int) -> Session:
-        v = Vocabulary(None, [])
+    def vocabulary_progress(self, user: User) -> Dict[int, VocabularyProgress]:
+        """
+        :return: the progress of the user by vocabulary ID, for the
+                 vocabularies with a session
+        """
+        last_sessions = (DbSession
+                         .select(DbVocabularySession.vocabulary.alias('vocabulary_id'),
+                                 fn.MAX(DbSession.id).alias('last_session'),
+                                 fn.MAX(Case(None, [(DbSession.finished, DbSession.id)]))
+                                 .alias('finished_session'))
+                         .join(DbVocabularySession)
+                         .join_from(DbSession, DbUser)
+                         .where(DbUser.email == user.email)
+                         .group_by(DbVocabularySession.vocabulary)
+                         .cte('last_sessions'))
+
+        query = (last_sessions
+                 .select_from(last_sessions.c.vocabulary_id,
+                              last_sessions.c.last_session,
+                              last_sessions.c.finished_session,
+                              DbSession.accuracy)
+                 .join(DbSession, JOIN.LEFT_OUTER,
+                       on=(DbSession.id == last_sessions.c.finished_session)))
+
+        ret = {}
+
+        for row in query.dicts():
+            unfinished_session_id = None
+            if row['last_session'] != row['finished_session']:
+                unfinished_session_id = row['last_session']
+
+            voc_id = row['vocabulary_id']
+            ret[voc_id] = VocabularyProgress(vocabulary_id=voc_id,
+                                             unfinished_session_id=unfinished_session_id,
+                                             accuracy=row['accuracy'] or 0.0)
+
+        return ret
+
+    def load_session(self,
+                     session_id: int,
+                     with_attempts: bool = True) -> Session:
+        """
+        :param with_attempts: whether to load the attempts of the session,
+                              they aren't needed to keep on learning
+
+        The session is restored from its saved state, which is rebuilt
+        from the attempts if it is missing or stale. The records of the
+        journal not flushed yet come on top of the database.
+        """
+        v = self._load_session_vocabulary(session_id)
+        words_by_id = {v.word_id(word): word for word in v}
+
+        # read before the database: the records flushed in between are
+        # then in the database and after the checkpoint
+        records = self._pending_records_of(session_id)
+
+        with db.atomic():
+            if records:
+                checkpoint = self._journal_checkpoint()
+                records = [record for record in records if record['seq'] > checkpoint]
+
+            db_session = DbSession.get_or_none(DbSession.id == session_id)
+            if db_session is None:
+                raise DbException(f'unknown session {session_id}')
+
+            current_word_id = db_session.current_word_id
+            if records:
+                current_word_id = records[-1]['current_word']
+
+            current_word = None
+            if current_word_id is not None:
+                current_word = words_by_id.get(current_word_id)
+
+            state = self._load_session_state(session_id, v, words_by_id,
+                                             current_word, records)
+
+            attempts = []
+            if state is not None and with_attempts:
+                attempts = self._load_attempts(session_id, words_by_id)
+                attempts += [self._attempt_from(attempt, words_by_id)
+                             for record in records
+                             for attempt in record['attempts']]
+
+        if state is None:
+            return self.rebuild_session_state(session_id)
+
+        ret = Session(attempts, v, state=state, seed=db_session.seed)
+        ret.set_id(session_id)
+        return ret
+
+    def rebuild_session_state(self, session_id: int) -> Session:
+        """
+        Replay all the attempts of a session to save its state again
+        """
+        self.flush_journal()
+
+        v = self._load_session_vocabulary(session_id)
+        words_by_id = {v.word_id(word): word for word in v}
 
         db_session = DbSession.get(session_id)
-        flipped = False
+        attempts = self._load_attempts(session_id, words_by_id)
+
+        current_word = words_by_id.get(db_session.current_word_id)
+
+        if current_word in {attempt.word for attempt in attempts if attempt.success}:
+            # the current word was found in an attempt without being updated
+            current_word = None
+
+        last_attempt_id = self._last_attempt_id(session_id)
+
+        ret = Session(attempts, v, current_word=current_word,
+                      seed=db_session.seed)
+        ret.set_id(session_id)
 
-        for db_voc_session in (DbVocabularySession
+        with db.atomic():
+            if ret.current_word != current_word:
+                db_session.current_word = v.word_id(ret.current_word)
+                db_session.finished = ret.is_finished
+                db_session.save()
+
+            self._save_session_state(session_id, last_attempt_id,
+                                     self._session_state_row(ret))
+            self._rebuild_session_words(session_id)
+
+        return ret
+
+    def _load_session_vocabulary(self, session_id: int) -> Vocabulary:
+        self._check_catalog()
+
+        db_voc_sessions = list(DbVocabularySession
                                .select()
-                               .where(DbVocabularySession.session == session_id)):
-            voc = self._load_vocabulary(db_voc_session.vocabulary)
+                               .where(DbVocabularySession.session == session_id))
+
+        # for now we expect that a session has only one vocabulary
+        if len(db_voc_sessions) == 1:
+            db_voc_session = db_voc_sessions[0]
+            return self._get_vocabulary(db_voc_session.vocabulary_id,
+                                        db_voc_session.flipped)
+
+        v = Vocabulary(None, [])
+        flipped = False
+
+        for db_voc_session in db_voc_sessions:
+            voc = self._get_vocabulary(db_voc_session.vocabulary_id)
 
             if db_voc_session.flipped:
                 flipped = True
@@ -247,6 +1099,11 @@ class Database:
         if flipped:
             v = v.flip()
 
+        return v
+
+    def _load_attempts(self,
+                       session_id: int,
+                       words_by_id: Dict[int, Word]) -> List[WordAttempt]:
         attempts = []
 
         for attempt in (DbWordAttempt
@@ -254,37 +1111,77 @@ class Database:
                         .where(DbWordAttempt.session == session_id)
                         .order_by(DbWordAttempt.id.asc())):
 
-            word = self._create_word_from(attempt.word)
-
-            if flipped:
-                word = word.flip()
-
-            attempt = WordAttempt(word=word,
+            attempt = WordAttempt(word=words_by_id[attempt.word_id],
                                   typed_word=attempt.typed_word,
                                   success=attempt.success,
-                                  time=attempt.time)
+                                  time=attempt.time,
+                                  word_id=attempt.word_id)
 
             attempts.append(attempt)
 
-        current_word = None
-        if db_session.current_word is not None:
-            current_word = self._create_word_from(db_session.current_word)
-            if flipped:
-                current_word = current_word.flip()
+        return attempts
 
-        ret = Session(attempts, v, current_word=current_word)
-        ret.set_id(session_id)
-        return ret
+    def _attempt_from(self,
+                      attempt: Dict[str, Any],
+                      words_by_id: Dict[int, Word]) -> WordAttempt:
+        """
+        :param attempt: an attempt of a record of the journal
+        """
+        return WordAttempt(word=words_by_id[attempt['word']],
+                           typed_word=attempt['typed_word'],
+                           success=attempt['success'],
+                           time=datetime.fromisoformat(attempt['time']),
+                           word_id=attempt['word'])
 
     def create_vocabulary(self, voc: Vocabulary) -> int:
+        return self.create_vocabularies([voc])[0]
+
+    def create_vocabularies(self, vocs: List[Vocabulary]) -> List[int]:
+        """
+        Create several vocabularies in one transaction: either all or
+        none of them are created
+
+        :return: the IDs of the new vocabularies
+        """
+        with db.atomic():
+            voc_ids = [self._insert_vocabulary(voc) for voc in vocs]
+            self._change_catalog()
+
+        for voc_id in voc_ids:
+            self._catalog.invalidate(voc_id)
+
+        return voc_ids
+
+    def _insert_vocabulary(self, voc: Vocabulary) -> int:
         input_language = DbLanguage.get(code=voc.input_language)
         output_language = DbLanguage.get(code=voc.output_language)
 
         new_voc = DbVocabulary.create(input_language=input_language,
                                       output_language=output_language)
 
-        for word in voc.words:
-            self._create_db_word(new_voc, word)
+        words = voc.words
+        rows = [(new_voc.id, word.word_input, word.word_output, word.directive)
+                for word in words]
+
+        # one prepared statement for all the words, generating the SQL
+        # of insert_many costs more than inserting the rows
+        insert_sql, _ = (DbWord
+                         .insert(vocabulary=new_voc.id,
+                                 word_input='',
+                                 word_output='',
+                                 directive=None)
+                         .sql())
+        db.cursor().executemany(insert_sql, rows)
+
+        # the words of the vocabulary were inserted in order
+        word_ids = (DbWord
+                    .select(DbWord.id)
+                    .where(DbWord.vocabulary == new_voc)
+                    .order_by(DbWord.id)
+                    .tuples())
+
+        voc.set_word_ids({word: word_id
+                          for word, (word_id,) in zip(words, word_ids)})
 
         voc.set_id(new_voc.id)
         return new_voc.id
@@ -294,12 +1191,17 @@ class Database:
                     word_output=word.word_output,
                     directive=word.directive)
 
-    def _load_vocabulary(self, voc: DbVocabulary) -> Vocabulary:
+    def _load_vocabulary(self,
+                         voc: DbVocabulary,
+                         db_words: Optional[List[DbWord]] = None) -> Vocabulary:
         name = None
         words = []
         word_ids = {}
 
-        for word in voc.words:
+        if db_words is None:
+            db_words = voc.words
+
+        for word in db_words:
             new_word = self._create_word_from(word)
 
             if new_word.is_name:
@@ -308,73 +1210,148 @@ class Database:
             word_ids[new_word] = word.id
             words.append(new_word)
 
-        input_language = voc.input_language.code
-        output_language = voc.output_language.code
+        # the primary key of a language is its code
+        input_language = voc.input_language_id
+        output_language = voc.output_language_id
 
-        ret = Vocabulary(name, [], input_language, output_language)
+        ret = Vocabulary(name, list(word_ids), input_language, output_language)
         ret.set_id(voc.id)
-
-        for word, word_id in word_ids.items():
-            ret.add_word(word, word_id)
+        ret.set_word_ids(word_ids)
 
         return ret
 
-    def get_vocabulary(self, user: Optional[User], voc_id: int) -> Optional[Vocabulary]:
-        vocs = self.list_vocabularies(user)
+    def _load_vocabularies(self) -> List[Vocabulary]:
+        db_words_by_voc = defaultdict(list)
 
-        return vocs.get(voc_id)
+        for db_word in DbWord.select().order_by(DbWord.id):
+            db_words_by_voc[db_word.vocabulary_id].append(db_word)
 
-    def vocabulary_stats(self, voc: Vocabulary) -> Optional[VocabularyStats]:
-        voc_id = voc.id
+        return [self._load_vocabulary(voc, db_words_by_voc[voc.id])
+                for voc in DbVocabulary.select()]
 
-        success_by_word_id = defaultdict(int)
-        error_by_word_id = defaultdict(int)
+    def _check_catalog(self):
+        version = DbCatalogVersion.select(fn.MAX(DbCatalogVersion.version)).scalar()
+        self._catalog.check_version(version or 0)
 
-        for attempt in (DbWordAttempt
-                        .select()
-                        .join(DbWord)
-                        .join(DbVocabulary)
-                        .where(DbVocabulary.id == voc_id)):
+    def _change_catalog(self):
+        """
+        Increase the version of the vocabularies, in the transaction
+        changing them
+        """
+        if DbCatalogVersion.update(version=DbCatalogVersion.version + 1).execute() == 0:
+            DbCatalogVersion.create(version=1)
 
-            word = self._create_word_from(attempt.word)
+        # the update locked the database, no other process changed it since
+        self._catalog.changed(DbCatalogVersion.select(fn.MAX(DbCatalogVersion.version)).scalar())
 
-            if attempt.success:
-                success_by_word_id[word] += 1
-            else:
-                error_by_word_id[word] += 1
+    def _get_vocabulary(self,
+                        voc_id: int,
+                        flipped: bool = False) -> Optional[Vocabulary]:
+        voc = self._catalog.get(voc_id, flipped)
 
-        all_words = set(error_by_word_id) | set(success_by_word_id)
-        ret = {}
+        if voc is None:
+            db_voc = DbVocabulary.get_or_none(DbVocabulary.id == voc_id)
 
-        for word in all_words:
-            success = success_by_word_id[word]
-            error = error_by_word_id[word]
+            if db_voc is None:
+                return None
 
-            ret[word] = error / (error + success) * 100
+            voc = self._load_vocabulary(db_voc)
+            self._catalog.put(voc)
 
-        return VocabularyStats(voc, ret)
+            if flipped:
+                voc = self._catalog.flipped(voc_id)
 
-    def list_vocabularies_for(self, languages: Optional[Set[Language]]) -> Dict[int, Vocabulary]:
-        vocs = {}
+        return voc
+
+    def _vocabulary_for(self,
+                        voc_id: int,
+                        languages: Optional[Set[Language]]) -> Optional[Vocabulary]:
+        """
+        :return: the vocabulary, flipped if the output language is
+                 the one known, None if the languages don't fit
+        """
+        voc = self._get_vocabulary(voc_id)
 
-        for voc in DbVocabulary.select():
+        if voc is None or languages is None:
+            return voc
 
-            if languages is not None:
-                input_language = Language.from_code(voc.input_language.code)
-                output_language = Language.from_code(voc.output_language.code)
+        input_language = Language.from_code(voc.input_language)
+        output_language = Language.from_code(voc.output_language)
 
-                know_input = input_language in languages
-                know_output = output_language in languages
+        know_input = input_language in languages
+        know_output = output_language in languages
 
-                if know_input == know_output:
-                    continue
+        if know_input == know_output:
+            return None
 
-            voc = self._load_vocabulary(voc)
+        if know_output:
+            voc = self._get_vocabulary(voc_id, flipped=True)
 
-            if languages is not None and know_output:
-                voc = voc.flip()
+        return voc
 
-            vocs[voc.id] = voc
+    def get_vocabulary(self, user: Optional[User], voc_id: int) -> Optional[Vocabulary]:
+        languages_spoken = None
+
+        if user is not None:
+            languages_spoken = user.languages_spoken
+
+        self._check_catalog()
+        return self._vocabulary_for(voc_id, languages_spoken)
+
+    def vocabulary_stats(self,
+                         voc: Vocabulary,
+                         user: Optional[User] = None,
+                         since: Optional[datetime] = None,
+                         until: Optional[datetime] = None) -> Optional[VocabularyStats]:
+        """
+        :param user: only count the attempts of this user
+        :param since: only count the attempts made from then
+        :param until: only count the attempts made before then
+        """
+        errors = Case(None, [(~DbWordAttempt.success, 1)], 0)
+
+        query = (DbWordAttempt
+                 .select(DbWordAttempt.word,
+                         fn.COUNT(DbWordAttempt.id).alias('attempts'),
+                         fn.SUM(errors).alias('errors'))
+                 .join(DbWord)
+                 .where(DbWord.vocabulary == voc.id)
+                 .group_by(DbWordAttempt.word))
+
+        if user is not None:
+            query = (query
+                     .join_from(DbWordAttempt, DbSession)
+                     .join(DbUser)
+                     .where(DbUser.email == user.email))
+
+        if since is not None:
+            query = query.where(DbWordAttempt.time >= since)
+
+        if until is not None:
+            query = query.where(DbWordAttempt.time < until)
+
+        ret = {}
+
+        for row in query.dicts():
+            ret[row['word']] = row['errors'] / row['attempts'] * 100
+
+        return VocabularyStats(voc, ret)
+
+    def list_vocabularies_for(self, languages: Optional[Set[Language]]) -> Dict[int, Vocabulary]:
+        self._check_catalog()
+        voc_ids = self._catalog.ids
+
+        if voc_ids is None:
+            self._catalog.reset(self._load_vocabularies())
+            voc_ids = self._catalog.ids
+
+        vocs = {}
+
+        for voc_id in sorted(voc_ids):
+            voc = self._vocabulary_for(voc_id, languages)
+
+            if voc is not None:
+                vocs[voc.id] = voc
 
         return vocs
 
@@ -386,23 +1363,57 @@ class Database:
 
         return self.list_vocabularies_for(languages_spoken)
 
-    def remove_vocabulary(self, voc: Vocabulary):
-        voc_id = voc.id
+    def remove_vocabulary(self,
+                          voc: Vocabulary,
+                          dry_run: bool = False) -> Dict[str, int]:
+        """
+        Remove a vocabulary with its words and its sessions
 
-        for db_word in (DbWord
-                        .select()
-                        .where(DbWord.vocabulary == voc_id)):
-            DbWordAttempt.delete().where(DbWordAttempt.word == db_word).execute()
-        DbWord.delete().where(DbWord.vocabulary == voc_id).execute()
+        :param dry_run: only count the rows which would be removed
+        :return: number of rows removed by table
+        """
+        # the pending attempts of its sessions are removed with them
+        self.flush_journal()
 
-        # for now we expect that a session has only one vocabulary
-        for db_voc_session in (DbVocabularySession
-                               .select()
-                               .where(DbVocabularySession.vocabulary == voc_id)):
-            DbSession.delete().where(DbSession.id == db_voc_session.session.id).execute()
-        DbVocabularySession.delete().where(DbVocabularySession.vocabulary == voc_id).execute()
+        voc_id = voc.id
 
-        DbVocabulary.delete().where(DbVocabulary.id == voc_id).execute()
+        words = DbWord.select(DbWord.id).where(DbWord.vocabulary == voc_id)
+        # for now we expect that a session has only one vocabulary
+        sessions = (DbVocabularySession
+                    .select(DbVocabularySession.session)
+                    .where(DbVocabularySession.vocabulary == voc_id))
+
+        # the sessions are found through DbVocabularySession, which
+        # is only removed after them
+        conditions = [
+            (DbWordAttempt, (DbWordAttempt.word.in_(words) |
+                             DbWordAttempt.session.in_(sessions))),
+            (DbSessionState, DbSessionState.session.in_(sessions)),
+            (DbSessionWord, DbSessionWord.session.in_(sessions)),
+            (DbSession, DbSession.id.in_(sessions)),
+            (DbVocabularySession, DbVocabularySession.vocabulary == voc_id),
+            (DbWord, DbWord.vocabulary == voc_id),
+            (DbVocabulary, DbVocabulary.id == voc_id),
+        ]
+
+        removed = {}
+
+        with db.atomic():
+            for model, condition in conditions:
+                table_name = model._meta.table_name
+
+                if dry_run:
+                    removed[table_name] = model.select().where(condition).count()
+                else:
+                    removed[table_name] = model.delete().where(condition).execute()
+
+            if not dry_run:
+                self._change_catalog()
+
+        if not dry_run:
+            self._catalog.remove(voc_id)
+
+        return removed
 
     def _create_db_word(self, voc: DbVocabulary, word: Word) -> DbWord:
         return DbWord.create(vocabulary=voc,
@@ -413,9 +1424,12 @@ class Database:
     def add_word(self, voc: Vocabulary, word: Word):
         db_voc = DbVocabulary.get(voc.id)
 
-        db_word = self._create_db_word(db_voc, word)
+        with db.atomic():
+            db_word = self._create_db_word(db_voc, word)
+            self._change_catalog()
 
         voc.add_word(word, db_word.id)
+        self._catalog.invalidate(voc.id)
 
     def update_word(self, voc: Vocabulary, word: Word,
                     word_input: str = None,
@@ -434,16 +1448,223 @@ class Database:
         word_id = voc.word_id(word)
         assert word_id is not None
 
-        DbWord.update(word_input=word_input,
-                      word_output=word_output,
-                      directive=directive).where(DbWord.id == word_id).execute()
+        with db.atomic():
+            DbWord.update(word_input=word_input,
+                          word_output=word_output,
+                          directive=directive).where(DbWord.id == word_id).execute()
+            self._change_catalog()
+        self._catalog.invalidate(voc.id)
+
+
+def _create_index(model: Model, *field_names: str):
+    fields = [model._meta.fields[name] for name in field_names]
+    db.execute(ModelIndex(model, fields, safe=True))
+
+
+def _create_session_state():
+    """
+    Create the table of the session states
+    """
+    db.create_tables([DbSessionState])
+
+
+def _create_indexes():
+    """
+    Index the foreign keys and the columns used by the queries
+    """
+    _create_index(DbUser, 'email')
+    _create_index(DbSpeak, 'user')
+    _create_index(DbWord, 'vocabulary')
+    _create_index(DbSession, 'user')
+    _create_index(DbSession, 'user', 'finished')
+    _create_index(DbVocabularySession, 'session')
+    _create_index(DbVocabularySession, 'vocabulary')
+    _create_index(DbVocabularySession, 'vocabulary', 'session')
+    _create_index(DbWordAttempt, 'session')
+    _create_index(DbWordAttempt, 'word')
+
+
+def _add_column(model: Model, field_name: str):
+    table = model._meta.table_name
+    field = model._meta.fields[field_name]
+
+    if field.column_name in [column.name for column in db.get_columns(table)]:
+        return
 
+    migrator = SqliteMigrator(db)
+    migrate(migrator.add_column(table, field.column_name, field))
 
-def load_database(name: str) -> Database:
-    db.init(name)
+
+def _add_session_summary():
+    """
+    Add the summary of the finished sessions
+    """
+    for field_name in ['attempt_count', 'error_count', 'words_in_error',
+                       'accuracy', 'finish_time']:
+        _add_column(DbSession, field_name)
+
+    Database().summarize_sessions()
+
+
+def _create_journal_checkpoint():
+    """
+    Create the table of the checkpoint of the journal
+    """
+    db.create_tables([DbJournalCheckpoint])
+
+
+def _add_answer_seq():
+    """
+    Add the sequence number of the last answer of the sessions
+    """
+    _add_column(DbSession, 'answer_seq')
+
+
+def _add_session_seed():
+    """
+    Add the seed of the words picked in the sessions
+    """
+    _add_column(DbSession, 'seed')
+    _add_column(DbSessionState, 'pick_count')
+
+    (DbSession
+     .update(seed=fn.ABS(fn.RANDOM()) % 2 ** 32)
+     .where(DbSession.seed.is_null())
+     .execute())
+
+
+def _create_catalog_version():
+    """
+    Create the table of the version of the vocabularies
+    """
+    db.create_tables([DbCatalogVersion])
+
+
+def _create_session_words():
+    """
+    Save the words of the session states in their own table, the states
+    are removed as they are rebuilt when the sessions are loaded
+    """
+    db.drop_tables([DbSessionState])
+    db.create_tables([DbSessionState, DbSessionWord])
+
+
+# the migrations of the schema, a database at version N had the first N
+# migrations applied. They should only alter what they explicitly name
+# as they run against the current models.
+MIGRATIONS = [
+    _create_session_state,
+    _create_indexes,
+    _add_session_summary,
+    _create_journal_checkpoint,
+    _add_answer_seq,
+    _add_session_seed,
+    _create_catalog_version,
+    _create_session_words,
+]
+
+
+def schema_version() -> int:
+    if not DbSchemaVersion.table_exists():
+        return 0
+
+    version = DbSchemaVersion.select(fn.MAX(DbSchemaVersion.version)).scalar()
+    return version or 0
+
+
+def migrate_database() -> List[int]:
+    """
+    Apply the migrations which weren't applied yet
+
+    :return: the versions applied
+    """
+    db.create_tables([DbSchemaVersion])
+    applied = []
+
+    for version, migration in enumerate(MIGRATIONS, 1):
+        if version <= schema_version():
+            continue
+
+        with db.atomic():
+            migration()
+            DbSchemaVersion.create(version=version, applied=datetime.now())
+
+        applied.append(version)
+
+    return applied
+
+
+# pragmas which can be set on the connections
+SQLITE_PRAGMAS = ['journal_mode', 'synchronous', 'busy_timeout',
+                  'cache_size', 'mmap_size']
+
+# pragmas of the connections by profile, see README.md for
+# the benchmark of each one
+SQLITE_PROFILES = {
+    # the defaults of SQLite: rollback journal, synchronous=FULL
+    # and a busy timeout of 5s
+    'default': {},
+    # WAL to read while writing, bigger cache and memory mapped I/O
+    'read-heavy': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 10000,
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+    },
+    # WAL without a sync on every commit, writers wait for each other
+    'write-heavy': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 30000,
+        'cache_size': -16000,
+        'mmap_size': 0,
+    },
+}
+
+
+def load_database(name: str,
+                  auto_migrate: bool = True,
+                  profile: str = 'default',
+                  pragmas: Optional[Dict[str, Any]] = None,
+                  journal: Optional[str] = None) -> Database:
+    """
+    :param auto_migrate: whether to apply the pending migrations to an
+                         existing database
+    :param profile: profile of the connections (see SQLITE_PROFILES)
+    :param pragmas: pragmas overriding the ones of the profile
+    :param journal: path of the journal of the word attempts (write-behind),
+                    the attempts left by a crash are written right away
+
+    Every thread opens its own connection with these pragmas.
+    """
+    if profile not in SQLITE_PROFILES:
+        raise DbException(f'unknown profile "{profile}"')
+
+    connection_pragmas = dict(SQLITE_PROFILES[profile])
+    connection_pragmas.update(pragmas or {})
+
+    db.init(name, pragmas=connection_pragmas)
     db.connect()
-    db.create_tables([DbVocabulary, DbWord, DbUser,
-                      DbVocabularySession, DbSession,
-                      DbWordAttempt, DbLanguage, DbSpeak])
 
-    return Database()
+    if not DbWord.table_exists():
+        # a new database already has the latest schema
+        with db.atomic():
+            db.create_tables(MODELS + [DbSchemaVersion])
+
+            for version in range(1, len(MIGRATIONS) + 1):
+                DbSchemaVersion.create(version=version, applied=datetime.now())
+    elif auto_migrate:
+        migrate_database()
+
+    if journal is None:
+        return Database()
+
+    checkpoint = 0
+    if DbJournalCheckpoint.table_exists():
+        checkpoint = DbJournalCheckpoint.select(fn.MAX(DbJournalCheckpoint.seq)).scalar() or 0
+
+    database = Database(Journal(journal, first_seq=checkpoint + 1))
+    database.flush_journal()
+
+    return database
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
+import threading
 import unittest
+from unittest import mock
 
+from datetime import datetime
 from typing import Set
 
-from store import load_database, DbException
-from learn import Vocabulary, Word, Language
+from store import load_database, DbException, DbSessionState, DbWordAttempt, Database
+from store import db, migrate_database, schema_version, MIGRATIONS
+from store import DbSchemaVersion, DbSession, DbJournalCheckpoint, DbSessionWord
+from learn import Vocabulary, Word, Language, WeightedSelection
 
 
 class TestStore(unittest.TestCase):
@@ -96,6 +103,57 @@ class TestStore(unittest.TestCase):
         self.assertIsNotNone(self.db.last_session(self.user, self.new_voc,
                                                   finished=True))
 
+    def test_vocabulary_progress(self):
+        self._create_vocabulary()
+        self._create_user()
+
+        self.assertEqual({}, self.db.vocabulary_progress(self.user))
+
+        session = self.db.create_new_session(self.user, self.new_voc)
+
+        progress = self.db.vocabulary_progress(self.user)[1]
+        self.assertEqual(session.id, progress.unfinished_session_id)
+        self.assertEqual(0.0, progress.accuracy)
+
+        for text in ['bla', None, None]:
+            current_word = session.current_word
+            if text is None:
+                text = current_word.word_output
+
+            attempt = session.guess(current_word, text)
+            self.db.add_word_attempt(session, attempt)
+
+        self.assertTrue(session.is_finished)
+
+        progress = self.db.vocabulary_progress(self.user)[1]
+        self.assertIsNone(progress.unfinished_session_id)
+        self.assertEqual(session.accuracy, progress.accuracy)
+        self.assertEqual(50.0, progress.accuracy)
+
+        summary = self.db.session_summary(session.id)
+        self.assertEqual(3, summary.attempt_count)
+        self.assertEqual(1, summary.error_count)
+        self.assertEqual(1, summary.words_in_error)
+        self.assertEqual(50.0, summary.accuracy)
+        self.assertEqual(session.attempts[-1].time.date(),
+                         summary.finish_time.date())
+
+        # sessions finished before the summaries existed
+        DbSession.update(accuracy=None).execute()
+        self.assertIsNone(self.db.session_summary(session.id))
+        self.assertEqual(1, self.db.summarize_sessions())
+        self.assertEqual(summary, self.db.session_summary(session.id))
+
+        new_session = self.db.create_new_session(self.user, self.new_voc)
+
+        progress = self.db.vocabulary_progress(self.user)[1]
+        self.assertEqual(new_session.id, progress.unfinished_session_id)
+        self.assertEqual(50.0, progress.accuracy)
+
+        other_user = self.db.create_user('other@hotmail.com', 'abc',
+                                         {Language.FRENCH})
+        self.assertEqual({}, self.db.vocabulary_progress(other_user))
+
     def test_vocabulary_stats(self):
         self._create_user()
         self._create_vocabulary()
@@ -114,6 +172,60 @@ class TestStore(unittest.TestCase):
         self.assertEqual(100.0, stats.errors_prob_for(word))
         self.assertEqual(0.0, stats.errors_prob_for(other_word))
 
+    def test_vocabulary_stats_filters(self):
+        self._create_user()
+        self._create_vocabulary()
+
+        new_session = self.db.create_new_session(self.user, self.new_voc)
+
+        word = new_session.current_word
+        attempt = new_session.guess(word, 'bla')
+
+        self.db.add_word_attempt(new_session, attempt)
+
+        attempt = new_session.guess(word, word.word_output)
+
+        self.db.add_word_attempt(new_session, attempt)
+
+        stats = self.db.vocabulary_stats(self.new_voc)
+        self.assertEqual(50.0, stats.errors_prob_for_id(self.new_voc.word_id(word)))
+
+        stats = self.db.vocabulary_stats(self.new_voc, user=self.user,
+                                         until=attempt.time)
+        self.assertEqual(100.0, stats.errors_prob_for(word))
+
+        stats = self.db.vocabulary_stats(self.new_voc, since=datetime.now())
+        self.assertEqual(0.0, stats.errors_prob_for(word))
+
+        other_user = self.db.create_user('other@hotmail.com', 'abc',
+                                         {Language.GERMAN})
+        stats = self.db.vocabulary_stats(self.new_voc, user=other_user)
+        self.assertEqual(0.0, stats.errors_prob_for(word))
+
+        # flipped vocabularies share the statistics of their words
+        flipped_voc = self.db.get_vocabulary(other_user, self.new_voc.id)
+        stats = self.db.vocabulary_stats(flipped_voc)
+        self.assertEqual(50.0, stats.errors_prob_for(word.flip()))
+
+    def test_weighted_selection(self):
+        self._create_user()
+        self._create_vocabulary()
+
+        new_session = self.db.create_new_session(self.user, self.new_voc)
+        word = new_session.current_word
+
+        for typed_word in ['bla', word.word_output]:
+            attempt = new_session.guess(word, typed_word)
+            self.db.add_word_attempt(new_session, attempt)
+
+        other_word = [w for w in self.new_voc if w != word][0]
+        selection = WeightedSelection(self.db.vocabulary_stats(self.new_voc))
+
+        # 50% of errors weigh as much as half an error of the session
+        self.assertEqual(3.0, selection.weight(word))
+        self.assertEqual(1.0, selection.weight(other_word))
+        self.assertEqual(5.0, selection.weight(other_word, error_count=1))
+
     def test_user(self):
         self._create_user()
         self.assertIsNotNone(self.user)
@@ -130,6 +242,40 @@ class TestStore(unittest.TestCase):
         other_user = self.db.get_user('test@hotmail.com', 'abc')
         self.assertEqual('test@hotmail.com', other_user.email)
 
+    def test_cached_credentials(self):
+        self._create_user()
+
+        credentials = self.db.credentials
+        hits = credentials.hits
+
+        user = self.db.get_user('test@hotmail.com', 'abc')
+        self.assertEqual(hits + 1, credentials.hits)
+        self.assertEqual({Language.FRENCH, Language.CHINESE},
+                         user.languages_spoken)
+
+        with self.assertRaises(DbException):
+            self.db.get_user('test@hotmail.com', 'def')
+
+        self.db.change_password('test@hotmail.com', 'def')
+
+        with self.assertRaises(DbException):
+            self.db.get_user('test@hotmail.com', 'abc')
+
+        user = self.db.get_user('test@hotmail.com', 'def')
+        self.assertEqual({Language.FRENCH, Language.CHINESE},
+                         user.languages_spoken)
+
+    def test_cached_credentials_other_process(self):
+        self._create_user()
+        self.db.get_user('test@hotmail.com', 'abc')
+
+        # the password is changed by the CLI in another process
+        Database().change_password('test@hotmail.com', 'def')
+
+        with self.assertRaises(DbException):
+            self.db.get_user('test@hotmail.com', 'abc')
+        self.db.get_user('test@hotmail.com', 'def')
+
 
     def test_normal_vocabulary(self):
         self._create_vocabulary()
@@ -210,6 +356,149 @@ class TestStore(unittest.TestCase):
 
         self.db.add_word_attempt(session_fetched, attempt)
 
+    def test_flipped_word_ids(self):
+        self._create_vocabulary()
+        self._create_user({Language.GERMAN})
+
+        first_voc = self.db.get_vocabulary(self.user, 1)
+        self.assertEqual(self.new_voc.word_id(self.word1),
+                         first_voc.word_id(self.word1.flip()))
+
+        new_session = self.db.create_new_session(self.user, first_voc)
+        current_word = new_session.current_word
+
+        attempt = new_session.guess(current_word, current_word.word_output)
+        self.assertEqual(first_voc.word_id(current_word), attempt.word_id)
+        self.db.add_word_attempt(new_session, attempt)
+
+        db_attempt = DbWordAttempt.get()
+        self.assertEqual(self.new_voc.word_id(current_word.flip()),
+                         db_attempt.word_id)
+
+        session = self.db.load_session(new_session.id)
+        self.assertEqual([current_word],
+                         [attempt.word for attempt in session.attempts])
+
+    def test_vocabulary_catalog(self):
+        self._create_vocabulary()
+        self._create_user({Language.GERMAN})
+
+        catalog = self.db.catalog
+        flipped_voc = self.db.list_vocabularies(self.user)[1]
+        self.assertEqual(0, catalog.misses)
+
+        self.assertIs(flipped_voc, self.db.get_vocabulary(self.user, 1))
+        voc = self.db.get_vocabulary(None, 1)
+        self.assertIs(voc, self.db.get_vocabulary(None, 1))
+        self.assertEqual(0, catalog.misses)
+
+        word3 = Word(word_input='fr_3',
+                     word_output='de_3',
+                     directive=None)
+        self.db.add_word(voc, word3)
+
+        self.assertIn(word3.flip(), self.db.get_vocabulary(self.user, 1).words)
+        self.assertEqual(1, catalog.misses)
+
+        self.db.update_word(voc, word3, word_input='fr_4')
+        self.assertIn(Word(word_input='fr_4', word_output='de_3', directive=None),
+                      self.db.get_vocabulary(None, 1).words)
+
+    def test_vocabulary_catalog_own_changes(self):
+        self._create_vocabulary()
+        voc2 = Vocabulary(self.word1, self.words,
+                          input_language='fr',
+                          output_language='en')
+        self.db.create_vocabulary(voc2)
+
+        catalog = self.db.catalog
+        vocs = self.db.list_vocabularies(None)
+        voc1 = vocs[1]
+        voc2 = vocs[2]
+
+        word3 = Word(word_input='fr_3',
+                     word_output='de_3',
+                     directive=None)
+        self.db.add_word(voc1, word3)
+        self.db.update_word(voc1, word3, word_input='fr_4')
+
+        # only the changed vocabulary is loaded again
+        self.assertEqual({1, 2}, catalog.ids)
+        self.assertIs(voc2, self.db.get_vocabulary(None, 2))
+        self.assertEqual(0, catalog.misses)
+        self.assertIsNot(voc1, self.db.get_vocabulary(None, 1))
+        self.assertEqual(1, catalog.misses)
+
+    def test_vocabulary_catalog_listeners(self):
+        self._create_vocabulary()
+        changes = []
+        self.db.catalog.add_listener(changes.append)
+
+        voc = self.db.get_vocabulary(None, 1)
+        self.db.add_word(voc, Word(word_input='fr_3',
+                                   word_output='de_3',
+                                   directive=None))
+        self.db.update_word(voc, self.word1, word_input='fr_4')
+        self.assertEqual([1, 1], changes)
+
+        # changed by another process
+        Database().add_word(voc, Word(word_input='fr_5',
+                                      word_output='de_5',
+                                      directive=None))
+        self.db.get_vocabulary(None, 1)
+        self.assertEqual([1, 1, None], changes)
+
+        self.db.remove_vocabulary(voc)
+        self.assertEqual([1, 1, None, 1], changes)
+
+    def test_vocabulary_catalog_other_process(self):
+        self._create_vocabulary()
+        self._create_user({Language.GERMAN})
+
+        # the vocabularies are changed by the CLI in another process
+        other_db = Database()
+
+        voc = self.db.get_vocabulary(None, 1)
+        word3 = Word(word_input='fr_3',
+                     word_output='de_3',
+                     directive=None)
+        other_db.add_word(other_db.get_vocabulary(None, 1), word3)
+        self.assertIn(word3, self.db.get_vocabulary(None, 1).words)
+
+        other_db.remove_vocabulary(other_db.get_vocabulary(None, 1))
+        self.assertEqual({}, self.db.list_vocabularies(self.user))
+        self.assertIsNone(self.db.get_vocabulary(None, 1))
+
+        with self.assertRaises(DbException):
+            self.db.create_new_session(self.user, voc)
+
+        self.db.remove_vocabulary(voc)
+        self.assertIsNone(self.db.get_vocabulary(None, 1))
+        self.assertEqual({}, self.db.list_vocabularies(None))
+
+    def test_create_vocabularies(self):
+        words = [Word(word_input=f'fr_{i}',
+                      word_output=f'de_{i}',
+                      directive=None)
+                 for i in range(450)]
+        voc1 = Vocabulary(words[0], words, 'fr', 'de')
+        voc2 = Vocabulary(words[1], words[:2], 'de', 'fr')
+
+        self.assertEqual([1, 2], self.db.create_vocabularies([voc1, voc2]))
+
+        for voc in [voc1, voc2]:
+            db_voc = self.db.get_vocabulary(None, voc.id)
+            self.assertEqual(voc.words, db_voc.words)
+
+            for word in voc:
+                self.assertEqual(db_voc.word_id(word), voc.word_id(word))
+
+        invalid_voc = Vocabulary(words[0], words, 'fr', 'xx')
+        with self.assertRaises(Exception):
+            self.db.create_vocabularies([voc1, invalid_voc])
+
+        self.assertEqual({1, 2}, self.db.list_vocabularies(None).keys())
+
     def test_list_vocabulary(self):
         self._create_vocabulary()
         self._create_user()
@@ -257,11 +546,28 @@ class TestStore(unittest.TestCase):
 
         self.db.create_new_session(self.user, self.new_voc)
         session = self.db.last_session(self.user, self.new_voc)
-        session.guess(self.word1, self.word1.word_output)
+        attempt = session.guess(self.word1, self.word1.word_output)
+        self.db.add_word_attempt(session, attempt)
+
+        expected = {
+            'dbwordattempt': 1,
+            'dbsessionstate': 1,
+            'dbsessionword': 1,
+            'dbsession': 1,
+            'dbvocabularysession': 1,
+            'dbword': 2,
+            'dbvocabulary': 1
+        }
 
-        self.db.remove_vocabulary(self.new_voc)
+        self.assertEqual(expected,
+                         self.db.remove_vocabulary(self.new_voc, dry_run=True))
+        self.assertEqual(1, len(self.db.list_vocabularies(None)))
+
+        self.assertEqual(expected, self.db.remove_vocabulary(self.new_voc))
 
         self.assertEqual({}, self.db.list_vocabularies(None))
+        self.assertEqual(0, DbWordAttempt.select().count())
+        self.assertEqual(0, DbSession.select().count())
 
     def test_add_word(self):
         self._create_vocabulary()
@@ -307,6 +613,300 @@ class TestStore(unittest.TestCase):
 
         self.assertEqual(2, len(session2.attempts))
 
+    def test_session_state(self):
+        self._create_vocabulary()
+        self._create_user()
+
+        session = self.db.create_new_session(self.user, self.new_voc)
+
+        word_attempt = session.guess(session.current_word, 'bla')
+        self.db.add_word_attempt(session, word_attempt)
+
+        restored = self.db.load_session(session.id, with_attempts=False)
+        self.assertEqual([], restored.attempts)
+        self.assertEqual(session.seed, restored.seed)
+        self.assertEqual(session.current_word, restored.current_word)
+        self.assertEqual(session.state, restored.state)
+
+        word_attempt = restored.guess(restored.current_word,
+                                      restored.current_word.word_output)
+        self.db.add_word_attempt(restored, word_attempt)
+
+        session = self.db.load_session(session.id)
+        self.assertEqual(2, len(session.attempts))
+        self.assertEqual(restored.state, session.state)
+
+    def test_session_words(self):
+        words = [Word(word_input=f'fr_{i}', word_output=f'de_{i}', directive=None)
+                 for i in range(20)]
+        voc = Vocabulary(words[0], words, input_language='fr', output_language='de')
+        self.db.create_vocabulary(voc)
+        self._create_user()
+
+        session = self.db.create_new_session(self.user, voc)
+        for i in range(10):
+            word = session.current_word
+            typed_word = word.word_output if i % 3 else 'bla'
+            self.db.add_word_attempt(session, session.guess(word, typed_word))
+
+        def session_words():
+            return set(DbSessionWord
+                       .select(DbSessionWord.word,
+                               DbSessionWord.error_count,
+                               DbSessionWord.found_attempt)
+                       .tuples())
+
+        # one row by word with an attempt
+        saved_words = session_words()
+        self.assertEqual(len({attempt.word for attempt in session.attempts}),
+                         len(saved_words))
+
+        # the words left are drawn as before the session was saved
+        restored = self.db.load_session(session.id, with_attempts=False)
+        self.assertEqual(session.state, restored.state)
+        self.assertEqual(session.upcoming_words(5), restored.upcoming_words(5))
+
+        DbSessionState.delete().execute()
+        restored = self.db.load_session(session.id, with_attempts=False)
+        self.assertEqual(session.state, restored.state)
+        self.assertEqual(saved_words, session_words())
+
+    def test_add_word_attempts(self):
+        self._create_vocabulary()
+        self._create_user()
+
+        session = self.db.create_new_session(self.user, self.new_voc)
+        self.assertIsNone(self.db.last_answer_seq(session.id))
+
+        word_attempts = [session.guess(session.current_word, 'bla'),
+                         session.guess(session.current_word,
+                                       session.current_word.word_output)]
+        self.db.add_word_attempts(session, word_attempts, answer_seq=2)
+        self.assertEqual(2, self.db.last_answer_seq(session.id))
+
+        restored = self.db.load_session(session.id)
+        self.assertEqual(2, len(restored.attempts))
+        self.assertEqual(session.state, restored.state)
+
+        # the answers without sequence number keep the last one
+        word_attempt = restored.guess(restored.current_word, 'bla')
+        self.db.add_word_attempt(restored, word_attempt)
+        self.assertEqual(2, self.db.last_answer_seq(session.id))
+
+    def test_rebuild_session_state(self):
+        self._create_vocabulary()
+        self._create_user()
+
+        session = self.db.create_new_session(self.user, self.new_voc)
+        word_attempt = session.guess(session.current_word,
+                                     session.current_word.word_output)
+        self.db.add_word_attempt(session, word_attempt)
+
+        # missing state
+        DbSessionState.delete().execute()
+
+        restored = self.db.load_session(session.id)
+        self.assertEqual(session.state, restored.state)
+        self.assertEqual(1, DbSessionState.select().count())
+
+        # stale state: an attempt was saved without its state
+        current_word = restored.current_word
+        DbWordAttempt.create(word=self.new_voc.word_id(current_word),
+                             session=session.id,
+                             typed_word=current_word.word_output,
+                             success=True,
+                             time=word_attempt.time)
+
+        restored = self.db.load_session(session.id, with_attempts=False)
+        self.assertTrue(restored.is_finished)
+        self.assertEqual(100.0, restored.accuracy)
+
+    def test_migrate_database(self):
+        self.assertEqual(len(MIGRATIONS), schema_version())
+        self.assertEqual([], migrate_database())
+
+        # a database created before the migrations
+        DbSchemaVersion.drop_table()
+        DbSessionState.drop_table()
+        db.execute_sql('DROP INDEX dbsession_user_id_finished')
+        self.assertEqual(0, schema_version())
+
+        self.assertEqual(list(range(1, len(MIGRATIONS) + 1)),
+                         migrate_database())
+        self.assertEqual(len(MIGRATIONS), schema_version())
+
+        self.assertTrue(DbSessionState.table_exists())
+        self.assertIn('dbsession_user_id_finished',
+                      [index.name for index in db.get_indexes('dbsession')])
+
+        self._create_vocabulary()
+        self._create_user()
+        self.assertIsNotNone(self.db.create_new_session(self.user, self.new_voc))
+
+    def test_profiles(self):
+        with self.assertRaises(DbException):
+            load_database(':memory:', profile='unknown')
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(db.close)
+
+        path = os.path.join(directory.name, 'learn.db')
+
+        load_database(path, profile='read-heavy', pragmas={'busy_timeout': 1000})
+        self.assertEqual('wal', db.execute_sql('PRAGMA journal_mode').fetchone()[0])
+        # 1 is NORMAL
+        self.assertEqual(1, db.execute_sql('PRAGMA synchronous').fetchone()[0])
+        self.assertEqual(1000, db.execute_sql('PRAGMA busy_timeout').fetchone()[0])
+        db.close()
+
+        load_database(path)
+        # 2 is FULL, the default
+        self.assertEqual(2, db.execute_sql('PRAGMA synchronous').fetchone()[0])
+
+    def test_journal(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(db.close)
+
+        path = os.path.join(directory.name, 'learn.db')
+        journal_path = os.path.join(directory.name, 'learn.journal')
+
+        self.db = load_database(path, journal=journal_path)
+        for language in Language:
+            self.db.create_language(language)
+        self._create_vocabulary()
+        self._create_user()
+
+        session = self.db.create_new_session(self.user, self.new_voc)
+        word_attempt = session.guess(session.current_word, 'bla')
+        self.db.add_word_attempt(session, word_attempt)
+
+        # read from the journal until it is flushed
+        self.assertEqual(0, DbWordAttempt.select().count())
+        restored = self.db.load_session(session.id)
+        self.assertEqual(1, len(restored.attempts))
+        self.assertEqual(session.state, restored.state)
+
+        self.assertEqual(1, self.db.flush_journal())
+        self.assertEqual(0, self.db.flush_journal())
+        self.assertEqual(1, DbWordAttempt.select().count())
+        self.assertEqual(0, os.path.getsize(journal_path))
+
+        restored = self.db.load_session(session.id)
+        self.assertEqual(1, len(restored.attempts))
+        self.assertEqual(session.state, restored.state)
+
+        # crash before the flush
+        word_attempt = restored.guess(restored.current_word,
+                                      restored.current_word.word_output)
+        self.db.add_word_attempt(restored, word_attempt)
+        self.db.journal.close()
+        db.close()
+
+        self.db = load_database(path, journal=journal_path)
+        self.assertEqual(2, DbWordAttempt.select().count())
+
+        session = self.db.load_session(session.id)
+        self.assertEqual(restored.state, session.state)
+        self.assertEqual(2, len(session.attempts))
+
+        # crash after the flush, before the journal is truncated
+        word_attempt = session.guess(session.current_word,
+                                     session.current_word.word_output)
+        self.db.add_word_attempt(session, word_attempt)
+        with open(journal_path, 'rb') as f:
+            journal = f.read()
+        self.db.flush_journal()
+        self.db.journal.close()
+        db.close()
+
+        with open(journal_path, 'wb') as f:
+            f.write(journal)
+
+        self.db = load_database(path, journal=journal_path)
+        self.assertEqual(3, DbWordAttempt.select().count())
+        self.assertIsNone(self.db.last_answer_seq(session.id))
+        self.assertEqual(3, DbJournalCheckpoint.get().seq)
+        self.assertTrue(DbSession.get(session.id).finished)
+        self.assertIsNotNone(self.db.session_summary(session.id))
+        self.db.journal.close()
+
+    def test_journal_torn_record(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(db.close)
+
+        path = os.path.join(directory.name, 'learn.db')
+        journal_path = os.path.join(directory.name, 'learn.journal')
+
+        self.db = load_database(path, journal=journal_path)
+        for language in Language:
+            self.db.create_language(language)
+        self._create_vocabulary()
+        self._create_user()
+        session = self.db.create_new_session(self.user, self.new_voc)
+        self.db.journal.close()
+        db.close()
+
+        # crash in the middle of a record
+        with open(journal_path, 'wb') as f:
+            f.write(b'{"seq": 1, "ses')
+
+        self.db = load_database(path, journal=journal_path)
+        self.assertEqual(0, DbWordAttempt.select().count())
+        self.assertEqual(0, os.path.getsize(journal_path))
+
+        session = self.db.load_session(session.id)
+        word_attempt = session.guess(session.current_word, 'bla')
+        self.db.add_word_attempt(session, word_attempt)
+        self.db.journal.close()
+        db.close()
+
+        self.db = load_database(path, journal=journal_path)
+        self.addCleanup(self.db.journal.close)
+        self.assertEqual(1, DbWordAttempt.select().count())
+
+    def test_journal_concurrent_answers(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(db.close)
+
+        path = os.path.join(directory.name, 'learn.db')
+        journal_path = os.path.join(directory.name, 'learn.journal')
+
+        self.db = load_database(path, journal=journal_path)
+        self.addCleanup(self.db.journal.close)
+        for language in Language:
+            self.db.create_language(language)
+        self._create_vocabulary()
+        self._create_user()
+
+        session = self.db.create_new_session(self.user, self.new_voc)
+        word_attempt = session.guess(session.current_word, 'bla')
+
+        # the answer is pending while it is being synced
+        syncing = threading.Event()
+        synced = threading.Event()
+
+        def fsync(fileno):
+            syncing.set()
+            synced.wait()
+
+        with mock.patch('journal.os.fsync', fsync):
+            thread = threading.Thread(target=self.db.add_word_attempts,
+                                      args=(session, [word_attempt], 1))
+            thread.start()
+            syncing.wait()
+
+            self.assertEqual(1, self.db.last_answer_seq(session.id))
+
+            synced.set()
+            thread.join()
+
+        self.assertEqual(1, self.db.flush_journal())
+        self.assertEqual(1, DbWordAttempt.select().count())
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)